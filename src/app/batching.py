@@ -0,0 +1,121 @@
+import asyncio
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+
+class MicroBatcher:
+    """
+    Groups concurrent requests into batches processed by one function call.
+
+    Items submitted while a batch is being collected are buffered for up to
+    `max_wait_ms` milliseconds or until `max_batch_size` items are waiting,
+    then processed together in a worker thread. Each caller receives the
+    result for its own item. If a batch fails, its items are retried one by
+    one, so a bad item only fails its own caller. A histogram of batch sizes
+    is kept for monitoring.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 32, max_wait_ms: float = 5) -> None:
+        """
+        Initializes the MicroBatcher object.
+
+        Args:
+            process_batch: A blocking function mapping a list of items to a list of results in the same order.
+            max_batch_size: The maximum number of items processed in one call.
+            max_wait_ms: The maximum time the first item of a batch waits for others to join.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_size_histogram = Counter()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """
+        Starts the background task collecting batches. Must be called from a running event loop.
+        """
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stops the background task.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queues an item and waits for the result of the batch it lands in.
+
+        Args:
+            item: The item to process.
+
+        Returns:
+            The result for `item`.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of batches processed and the histogram of their sizes.
+
+        Returns:
+            A dictionary with the batch count and a mapping of batch size to count.
+        """
+        histogram = {str(size): count for size, count in sorted(self.batch_size_histogram.items())}
+        return {"batches": sum(self.batch_size_histogram.values()), "batch_sizes": histogram}
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batch_size_histogram[len(batch)] += 1
+            try:
+                results = await run_in_threadpool(self.process_batch, [item for item, _ in batch])
+            except Exception as e:
+                if len(batch) == 1:
+                    self._resolve(batch[0][1], exception=e)
+                else:
+                    await self._process_one_by_one(batch)
+                continue
+            for (_, future), result in zip(batch, results):
+                self._resolve(future, result)
+
+    async def _process_one_by_one(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        for item, future in batch:
+            try:
+                result = (await run_in_threadpool(self.process_batch, [item]))[0]
+            except Exception as e:
+                self._resolve(future, exception=e)
+                continue
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, result: Any = None, exception: Optional[Exception] = None) -> None:
+        if future.done():  # the caller went away
+            return
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
@@ -0,0 +1,193 @@
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class Job:
+    """
+    Tracks the progress of one background ETL run.
+
+    A job moves from "queued" to "running" and then to "succeeded" or "failed",
+    or to "cancelled" if it is stopped by `cancel`. While running, it records
+    the stages in progress, progress counts and the timing of every stage,
+    which the `/jobs/{job_id}` endpoint reports. The stages of the ETL
+    pipeline run concurrently, so each active stage is listed with the number
+    of times it is currently entered.
+    """
+
+    def __init__(self, pages: Optional[int] = None) -> None:
+        """
+        Initializes the Job object.
+
+        Args:
+            pages: The number of pages scraped per website by this run.
+        """
+        self.id = uuid.uuid4().hex
+        self.pages = pages
+        self.status = "queued"
+        self.active_stages: Dict[str, int] = {}
+        self.counts: Dict[str, int] = {}
+        self.stages: Dict[str, Dict[str, Optional[float]]] = {}
+        self.message = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancelled = threading.Event()  # checked by the ETL pipeline between items
+        self._lock = threading.Lock()
+
+    def cancel(self) -> None:
+        """
+        Asks the job to stop. A running ETL pipeline stops reading new pages and
+        drains what is already queued, so the job ends after the current items.
+        """
+        self.cancelled.set()
+        with self._lock:
+            if self.status == "queued":
+                self.status = "cancelled"
+
+    @contextmanager
+    def track_stage(self, name: str) -> Iterator[None]:
+        """
+        Context manager marking a stage active and recording its start, end and duration.
+
+        A stage entered again while it is active, e.g. by several threads,
+        keeps its start time and finishes when the last of them exits.
+
+        Args:
+            name: The name of the stage.
+        """
+        started_at = time.time()
+        with self._lock:
+            active = self.active_stages.get(name, 0)
+            self.active_stages[name] = active + 1
+            if active == 0:
+                self.stages[name] = {"started_at": started_at, "finished_at": None, "seconds": None}
+        try:
+            yield
+        finally:
+            finished_at = time.time()
+            with self._lock:
+                self.active_stages[name] -= 1
+                if self.active_stages[name] == 0:
+                    del self.active_stages[name]
+                    timing = self.stages[name]
+                    timing.update(finished_at=finished_at, seconds=finished_at - timing["started_at"])
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Adds to a progress count.
+
+        Args:
+            name: The name of the count, e.g. "scraped_products".
+            value: The amount to add.
+        """
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns a JSON serialisable summary of the job.
+
+        Returns:
+            A dictionary with the status, active stages, counts and stage timings.
+        """
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "pages": self.pages,
+                "status": self.status,
+                "active_stages": dict(self.active_stages),
+                "counts": dict(self.counts),
+                "stages": {name: dict(timing) for name, timing in self.stages.items()},
+                "message": self.message,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class JobManager:
+    """
+    Runs jobs in a background worker thread so requests return immediately.
+
+    Jobs run one at a time in submission order. The most recent `max_jobs`
+    jobs are kept so their progress can be looked up by id.
+    """
+
+    def __init__(self, max_workers: int = 1, max_jobs: int = 100) -> None:
+        """
+        Initializes the JobManager object.
+
+        Args:
+            max_workers: The number of jobs allowed to run at the same time.
+            max_jobs: The number of jobs kept for lookup.
+        """
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="etl-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, target: Callable[[Job], Any], pages: Optional[int] = None) -> Job:
+        """
+        Queues a job.
+
+        Args:
+            target: The function to run. It receives the Job to report progress on.
+            pages: The number of pages scraped per website by this run.
+
+        Returns:
+            The queued Job.
+        """
+        job = Job(pages=pages)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, target, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Looks up a job by id.
+
+        Args:
+            job_id: The id returned when the job was submitted.
+
+        Returns:
+            The Job, or None if it is unknown.
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self) -> None:
+        """
+        Cancels queued jobs, asks the running job to stop and waits for it to end,
+        so the databases it writes to can be closed afterwards.
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _run(self, target: Callable[[Job], Any], job: Job) -> None:
+        if job.cancelled.is_set():
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            target(job)
+            job.status = "cancelled" if job.cancelled.is_set() else "succeeded"
+        except Exception as e:
+            print(traceback.format_exc())
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
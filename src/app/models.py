@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Optional
+
 from pydantic import BaseModel
 
 
@@ -12,6 +15,12 @@ class Query(BaseModel):
     - **type (Optional[str]):** An optional field to specify the type of search.
       Valid options depend on your specific implementation, but common examples
       might include "products", "articles", or "users".
+    - **brand (Optional[str]):** Only return items of this brand.
+    - **scraped_after (Optional[datetime]):** Only return items scraped at or after this time.
+    - **scraped_before (Optional[datetime]):** Only return items scraped at or before this time.
+
+    The filters are applied inside the vector search, so a filtered query
+    still returns up to the requested number of matching items.
 
     By using this model, you can ensure that your API receives well-structured
     query parameters, improving data validation and making your code more robust.
@@ -19,3 +28,29 @@ class Query(BaseModel):
 
     text: str
     type: str
+    brand: Optional[str] = None
+    scraped_after: Optional[datetime] = None
+    scraped_before: Optional[datetime] = None
+
+
+class SearchResult(BaseModel):
+    """
+    Represents one similar image returned by the `/search` endpoint.
+
+    - **id (int):** The ID of the item in the items database.
+    - **title (str):** The product title.
+    - **brand (str):** The brand selling the product.
+    - **url (str):** The product page URL.
+    - **imgpath (str):** The path to the downloaded product image.
+    - **distance (Optional[float]):** The cosine distance from the query; smaller is more similar.
+      None for text search hits found only by the full text search of the titles.
+    - **score (Optional[float]):** The reciprocal rank fusion score of text search hits; larger is better.
+    """
+
+    id: int
+    title: str
+    brand: str
+    url: str
+    imgpath: str
+    distance: Optional[float] = None
+    score: Optional[float] = None
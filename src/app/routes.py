@@ -1,30 +1,63 @@
 import os
-import traceback
+from functools import partial
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from src.config import IMAGE_DIR
+from src.database.cache import LRUCache
+from src.etl.driver_pool import DriverPool
 
-from .models import Query
+from .jobs import JobManager
+from .models import Query, SearchResult
 from .utils import (
-    initialise_database,
-    search_images_by_imgpath,
-    search_images_by_text,
-    update_database,
-    verify_databases,
+    UnsearchableQueriesError,
+    get_databases,
+    get_driver_pool,
+    get_embedding_batchers,
+    get_job_manager,
+    get_search_result_cache,
+    run_update_job,
+    search_images,
+    search_images_batch,
 )
 
 router = APIRouter()
 
+IMAGE_EXTENSIONS = {".bmp", ".gif", ".jpeg", ".jpg", ".png", ".webp"}
+
 
 @router.get("/healthcheck")
 def healthcheck():
     return JSONResponse(content={"message": "connected!"}, status_code=200)
 
 
+@router.get("/stats")
+def stats(
+    databases: tuple = Depends(get_databases),
+    batchers: dict = Depends(get_embedding_batchers),
+    driver_pool: DriverPool = Depends(get_driver_pool),
+    search_result_cache: LRUCache = Depends(get_search_result_cache),
+):
+    _, vector_db = databases
+    content = {
+        "query_embedding_cache": vector_db.text_embedding_cache.stats(),
+        "search_result_cache": search_result_cache.stats(),
+        "embedding_batches": {query_type: batcher.stats() for query_type, batcher in batchers.items()},
+        "vectordb_version": vector_db.version,
+        "driver_pool": driver_pool.stats(),
+    }
+    return JSONResponse(content=content)
+
+
 @router.post("/update/{pages}")
-async def update_db(pages: int, databases: tuple = Depends(initialise_database)):
+def update_db(
+    pages: int,
+    databases: tuple = Depends(get_databases),
+    job_manager: JobManager = Depends(get_job_manager),
+    driver_pool: DriverPool = Depends(get_driver_pool),
+):
     """
     Triggers the ETL pipeline to update databases asynchronously.
 
@@ -32,43 +65,112 @@ async def update_db(pages: int, databases: tuple = Depends(initialise_database))
 
     - **pages (int):** The number of pages to scrape for each website during the update.
     - **databases (Tuple[Any, Any], optional):** A tuple containing database
-      connection objects, obtained through the `initialise_database` dependency.
+      connection objects shared by the application, obtained through the
+      `get_databases` dependency.
+    - **job_manager (JobManager, optional):** The background job manager,
+      obtained through the `get_job_manager` dependency.
+    - **driver_pool (DriverPool, optional):** The webdriver sessions shared by
+      ETL runs, obtained through the `get_driver_pool` dependency.
+
+    It queues `update_database` as a background job and returns the job id
+    immediately, so searches keep being served while the pipeline runs. The
+    progress of the job can be followed with `/jobs/{job_id}`.
+    """
+    job = job_manager.submit(partial(run_update_job, *databases, pages, driver_pool=driver_pool), pages=pages)
+    message = f"ETL pipeline trigger successful. Job {job.id} queued."
+    return JSONResponse(content={"message": message, "job_id": job.id}, status_code=202)
+
 
-    It attempts to update the databases using the `update_database` function and
-    then verifies the number of items and vectors in both databases using
-    `verify_databases`. Upon success, it returns a JSON response with a success
-    message containing the number of items and vectors.
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, job_manager: JobManager = Depends(get_job_manager)):
+    """
+    Reports the status, active stages, progress counts and stage timings of an ETL job.
 
     Raises:
 
-    - **HTTPException (500):** If any exception occurs during the update or
-      verification process. The detailed error message is included in the response.
+    - **HTTPException (404):** If no job with the given id is known.
     """
-    try:
-        _, _ = update_database(pages=pages, *databases)
-        num_items, num_vectors = verify_databases(*databases)
-        message = f"ETL pipeline trigger successful. {num_items} in Items DB. {num_vectors} in Vector DB."
-        return JSONResponse(content={"message": message})
-    except Exception as e:
-        tb = traceback.format_exc()
-        print(tb)
-        raise HTTPException(status_code=500, detail=f"Error triggering ETL pipeline: {str(e)}")
-
-
-@router.post("/search")
-def search_data(query: Query, databases: tuple = Depends(initialise_database)):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return JSONResponse(content=job.to_dict())
+
+
+def resolve_image_path(image_path: str) -> Optional[str]:
+    """
+    Resolves an image path from a query against the image directory.
+
+    Returns None when the path escapes the image directory, is not a file or
+    is not an image, e.g. the image store manifest.
+    """
+    base_path = IMAGE_DIR
+    fullpath = os.path.normpath(os.path.join(base_path, image_path))
+    if not fullpath.startswith(base_path):
+        return None
+    if not os.path.isfile(fullpath):  # Check for image path safety
+        return None
+    if os.path.splitext(fullpath)[1].lower() not in IMAGE_EXTENSIONS:
+        return None
+    return fullpath
+
+
+def query_filters(query: Query) -> Dict:
+    """
+    Collects the brand and scrape time filters set on a query.
+    """
+    filters = {"brand": query.brand, "scraped_after": query.scraped_after, "scraped_before": query.scraped_before}
+    return {name: value for name, value in filters.items() if value is not None}
+
+
+@router.post("/search", response_model=List[SearchResult])
+async def search_data(
+    query: Query,
+    databases: tuple = Depends(get_databases),
+    batchers: dict = Depends(get_embedding_batchers),
+    cache: LRUCache = Depends(get_search_result_cache),
+):
+    filters = query_filters(query)
     if query.type == "text":
-        result_df = search_images_by_text(*databases, query.text, n=10)
+        response = await search_images(*databases, batchers, cache, query.type, query.text, n=10, filters=filters)
     elif query.type == "image":
-        base_path = IMAGE_DIR
-        fullpath = os.path.normpath(os.path.join(base_path, query.text))
-        if not fullpath.startswith(base_path):
-            return JSONResponse(content={"error": "Image path invalid"}, status_code=400)
-        if os.path.isfile(fullpath):  # Check for image path safety
-            result_df = search_images_by_imgpath(*databases, fullpath, n=10)  # Use unpacking
-        else:
+        fullpath = resolve_image_path(query.text)
+        if fullpath is None:
             return JSONResponse(content={"error": "Image path invalid"}, status_code=400)
+        response = await search_images(*databases, batchers, cache, query.type, fullpath, n=10, filters=filters)  # Use unpacking
     else:
         return JSONResponse(content={"error": "Invalid query type"}, status_code=400)
 
-    return JSONResponse(content=result_df.to_dict(orient="records"))
+    # already encoded, the response model only documents the schema
+    return Response(content=response, media_type="application/json")
+
+
+@router.post("/search/batch", response_model=List[List[SearchResult]])
+def search_data_batch(queries: List[Query], databases: tuple = Depends(get_databases)):
+    """
+    Searches for similar images for a list of queries in one request.
+
+    Text and image queries are embedded as one batch per type and searched
+    as one batch per type and filters.
+    The response holds the results of each query, in the same order as the
+    queries. The whole batch is rejected if any query is invalid: with a 400
+    for a bad query type or image path, and with a 422 naming the queries
+    whose image cannot be read.
+    """
+    resolved_queries = []
+    for query in queries:
+        filters = query_filters(query)
+        if query.type == "text":
+            resolved_queries.append((query.type, query.text, filters))
+        elif query.type == "image":
+            fullpath = resolve_image_path(query.text)
+            if fullpath is None:
+                return JSONResponse(content={"error": f"Image path invalid: {query.text}"}, status_code=400)
+            resolved_queries.append((query.type, fullpath, filters))
+        else:
+            return JSONResponse(content={"error": "Invalid query type"}, status_code=400)
+
+    try:
+        return search_images_batch(*databases, resolved_queries, n=10)
+    except UnsearchableQueriesError as e:
+        unsearchable = ", ".join(f"{position} ({queries[position].text})" for position in e.positions)
+        return JSONResponse(content={"error": f"Cannot embed the queries at positions {unsearchable}"}, status_code=422)
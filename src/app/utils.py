@@ -1,21 +1,47 @@
 import json
-from typing import Optional, Tuple
-
-import pandas as pd
-
-from src.config import WEBSCRAPER_CONFIG
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.engine import Row
+
+from src.config import (
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+    HYBRID_SEARCH_CANDIDATES,
+    HYBRID_SEARCH_RRF_K,
+    SEARCH_RESULT_CACHE_SIZE,
+    SEARCH_RESULT_CACHE_TTL,
+    WEBSCRAPER_CONFIG,
+)
+from src.database.cache import LRUCache
 from src.database.sql_models import ItemDB
-from src.database.vector_models import VectorDB
-from src.etl.extract import scrape_all_websites
+from src.database.vector_models import (
+    VectorDB,
+    build_metadata_filter,
+    normalise_query_text,
+)
+from src.etl.download import ImageDownloader
+from src.etl.driver_pool import DriverPool
+from src.etl.extract import iter_scraped_pages
 from src.etl.load import insert_items_into_sql, insert_items_into_vectordb
+from src.etl.pipeline import run_pipeline
+
+from .batching import MicroBatcher
+from .jobs import Job, JobManager
+from .models import SearchResult
 
 
 def initialise_database() -> Tuple[ItemDB, VectorDB]:
     """
-    Initializes the Flask application with database connections.
+    Initializes the database connections used by the application.
 
     This function creates connections to the PostgreSQL and vector databases
-    using the provided models.
+    using the provided models. It is called once from the application lifespan,
+    so the engine, connection pool, chroma client and CLIP model are shared by
+    every request.
 
     Returns:
         tuple[ItemDB, VectorDB]: A tuple containing instances of ItemDB and VectorDB
@@ -28,6 +54,120 @@ def initialise_database() -> Tuple[ItemDB, VectorDB]:
     return db, vector_db
 
 
+def close_database(item_db: ItemDB, vector_db: VectorDB) -> None:
+    """
+    Releases the connections created by `initialise_database`.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+    """
+    item_db.close()
+    vector_db.close()
+
+
+def get_databases(request: Request) -> Tuple[ItemDB, VectorDB]:
+    """
+    FastAPI dependency returning the databases shared by the application.
+
+    Args:
+        request (Request): The incoming request, used to reach the application state.
+
+    Returns:
+        tuple[ItemDB, VectorDB]: The ItemDB and VectorDB instances built at startup.
+    """
+    return request.app.state.databases
+
+
+def initialise_embedding_batchers(vector_db: VectorDB) -> Dict[str, MicroBatcher]:
+    """
+    Starts one micro-batcher per query type in front of the embedding function.
+
+    Concurrent `/search` requests submit their query to these batchers, so the
+    CLIP model encodes them together instead of once per request. Must be
+    called from a running event loop.
+
+    Args:
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+
+    Returns:
+        Dict[str, MicroBatcher]: The started batchers, keyed by query type ("text" or "image").
+    """
+    batchers = {
+        "text": MicroBatcher(vector_db.embed_texts, max_batch_size=EMBEDDING_BATCH_MAX_SIZE, max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS),
+        "image": MicroBatcher(vector_db.embed_images, max_batch_size=EMBEDDING_BATCH_MAX_SIZE, max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS),
+    }
+    for batcher in batchers.values():
+        batcher.start()
+    return batchers
+
+
+def get_embedding_batchers(request: Request) -> Dict[str, MicroBatcher]:
+    """
+    FastAPI dependency returning the embedding micro-batchers shared by the application.
+
+    Args:
+        request (Request): The incoming request, used to reach the application state.
+
+    Returns:
+        Dict[str, MicroBatcher]: The batchers started at startup, keyed by query type.
+    """
+    return request.app.state.embedding_batchers
+
+
+def initialise_search_result_cache() -> LRUCache:
+    """
+    Creates the cache of encoded search responses.
+
+    Its keys hold the version of the vector collection, which starts at 0 for
+    every VectorDB instance, so the cache is created together with the
+    databases and shared through the application state, never across them.
+
+    Returns:
+        LRUCache: An empty cache.
+    """
+    return LRUCache(maxsize=SEARCH_RESULT_CACHE_SIZE, ttl=SEARCH_RESULT_CACHE_TTL)
+
+
+def get_search_result_cache(request: Request) -> LRUCache:
+    """
+    FastAPI dependency returning the search result cache shared by the application.
+
+    Args:
+        request (Request): The incoming request, used to reach the application state.
+
+    Returns:
+        LRUCache: The cache created at startup.
+    """
+    return request.app.state.search_result_cache
+
+
+def get_job_manager(request: Request) -> JobManager:
+    """
+    FastAPI dependency returning the background job manager shared by the application.
+
+    Args:
+        request (Request): The incoming request, used to reach the application state.
+
+    Returns:
+        JobManager: The job manager created at startup.
+    """
+    return request.app.state.job_manager
+
+
+def get_driver_pool(request: Request) -> DriverPool:
+    """
+    FastAPI dependency returning the webdriver pool shared by the ETL runs.
+
+    Args:
+        request (Request): The incoming request, used to reach the application state.
+
+    Returns:
+        DriverPool: The driver pool created at startup.
+    """
+    return request.app.state.driver_pool
+
+
 def verify_databases(item_db: ItemDB, vector_db: VectorDB) -> Tuple[int, int]:
     """
     Count number of vectors and items in databases.
@@ -45,101 +185,478 @@ def verify_databases(item_db: ItemDB, vector_db: VectorDB) -> Tuple[int, int]:
     return num_items, num_vectors
 
 
-def update_database(item_db: ItemDB, vector_db: VectorDB, pages: Optional[int] = 100) -> Tuple[ItemDB, VectorDB]:
+def update_database(
+    item_db: ItemDB, vector_db: VectorDB, pages: Optional[int] = 100, job: Optional[Job] = None, driver_pool: Optional[DriverPool] = None
+) -> Tuple[ItemDB, VectorDB]:
     """
     Runs the ETL pipeline to scrape websites and update both databases
 
+    The pipeline streams page by page: the products of each scraped page are
+    passed through bounded queues to the image download, SQL load and vector
+    load stages, which all run concurrently. New items become searchable
+    while later pages are still being scraped, and only a few pages of
+    products are held in memory at any time.
+
     Args:
         item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
         vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        pages (int, optional): The number of pages to scrape for each website (default: 100).
+        job (Job, optional): The job to report stages and progress counts on.
+        driver_pool (DriverPool, optional): The webdriver sessions to scrape with; each website opens
+            its own session if None.
 
     Returns:
         Tuple[ItemDB, VectorDB]: A tuple containing the same ItemDB and VectorDB instances
             used for deletion.
 
     """
+    job = job or Job(pages=pages)
 
     with open(WEBSCRAPER_CONFIG) as json_file:
         website_configs = json.load(json_file)
 
-    scraped_products = scrape_all_websites(website_configs, pages=pages)
-    print(f"scraped {len(scraped_products)} items from websites")
-
-    # Insert data into SQL database
-    insert_items_into_sql(item_db, scraped_products)
-    insert_items_into_vectordb(item_db, vector_db)
+    downloader = ImageDownloader()
+
+    def scrape_pages():
+        with job.track_stage("scrape"):
+            for _, page_products in iter_scraped_pages(website_configs, pages=pages, driver_pool=driver_pool):
+                job.increment("scraped_pages")
+                job.increment("scraped_products", len(page_products))
+                yield page_products
+
+    def download_images(page_products):
+        downloaded, failed = downloader.download_product_images(page_products)
+        job.increment("downloaded_images", downloaded)
+        job.increment("failed_images", failed)
+        return page_products
+
+    def load_sql(page_products):
+        inserted, skipped = insert_items_into_sql(item_db, page_products)
+        job.increment("inserted_items", inserted)
+        job.increment("skipped_items", skipped)
+
+    def load_vectordb(_):
+        # picks up every item still pending, so pages queued meanwhile are loaded together
+        job.increment("inserted_vectors", insert_items_into_vectordb(item_db, vector_db))
+
+    try:
+        run_pipeline(
+            scrape_pages(),
+            [("download_images", download_images), ("load_sql", load_sql), ("load_vectordb", load_vectordb)],
+            stage_context=job.track_stage,
+            stop=job.cancelled,
+        )
+    finally:
+        # local vector stores only save their index, and the image store its manifest, once per run
+        vector_db.persist()
+        downloader.save()
+    print(f"scraped {job.counts.get('scraped_products', 0)} items from websites")
     print("finished inserting items into db")
 
     return item_db, vector_db
 
 
-def query_image_from_sqldb(item_db: ItemDB, ids_list: list[int]) -> pd.DataFrame:
+def build_search_results(
+    summaries: Dict[int, Row], ids_list: List[str], distances: List[Optional[float]], scores: Optional[List[float]] = None
+) -> List[SearchResult]:
+    """
+    Pairs the nearest neighbours returned by the vector database with their item details.
+
+    Args:
+        summaries (Dict[int, Row]): Item details keyed by ID, as returned by `ItemDB.read_item_summaries_by_ids`.
+        ids_list (List[str]): The IDs of the ranked items, e.g. as returned by the vector database.
+        distances (List[Optional[float]]): The distance of each ID in `ids_list` from the query, None for
+            items only found by the lexical search.
+        scores (Optional[List[float]]): The fused hybrid search score of each ID in `ids_list`, if any.
+
+    Returns:
+        List[SearchResult]: One record per image found in `summaries`, in the order of `ids_list`.
+    """
+    results = []
+    for item_id, distance, score in zip(ids_list, distances, scores or [None] * len(ids_list)):
+        summary = summaries.get(int(item_id))
+        if summary is not None:
+            results.append(
+                SearchResult(
+                    id=summary.id,
+                    title=summary.title,
+                    brand=summary.brand,
+                    url=summary.url,
+                    imgpath=summary.filepath,
+                    distance=distance,
+                    score=score,
+                )
+            )
+    return results
+
+
+def run_update_job(item_db: ItemDB, vector_db: VectorDB, pages: int, job: Job, driver_pool: Optional[DriverPool] = None) -> None:
+    """
+    Runs `update_database` as a background job and records the final database sizes.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        pages (int): The number of pages to scrape for each website.
+        job (Job): The job to report progress on.
+        driver_pool (DriverPool, optional): The webdriver sessions to scrape with.
+    """
+    update_database(item_db, vector_db, pages=pages, job=job, driver_pool=driver_pool)
+    with job.track_stage("verify"):
+        num_items, num_vectors = verify_databases(item_db, vector_db)
+    job.message = f"ETL pipeline successful. {num_items} in Items DB. {num_vectors} in Vector DB."
+
+
+def hydrate_search_results(
+    item_db: ItemDB, ids_list: List[str], distances: List[Optional[float]], scores: Optional[List[float]] = None
+) -> List[SearchResult]:
     """
-    Queries images from the PostgreSQL database based on IDs.
+    Joins the ranked items returned by a search to their item details.
 
-    This function retrieves information about images (items) from the database
-    given a list of IDs. It returns a Pandas DataFrame for easy manipulation.
+    Item details are fetched in one round trip (or from the item summary cache)
+    and the records are returned in the same order as the search ranking,
+    each paired with its own distance and score.
 
     Args:
         item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
-        ids_list (list[int]): A list of integer IDs for the items to retrieve.
+        ids_list (List[str]): The IDs of the ranked items, e.g. as returned by the vector database.
+        distances (List[Optional[float]]): The distance of each ID in `ids_list` from the query.
+        scores (Optional[List[float]]): The fused hybrid search score of each ID in `ids_list`, if any.
 
     Returns:
-        pd.DataFrame: A Pandas DataFrame containing details about the queried images.
-            Columns include ID, title, brand, URL, and filepath.
+        List[SearchResult]: One record per image found in the items database, in ranking order.
     """
 
-    items = item_db.read_item_by_ids(ids_list)
-    result = {item.id: {"title": item.title, "brand": item.brand, "url": item.url, "imgpath": item.filepath} for item in items}
-    result_df = pd.DataFrame(result).T
-    return result_df
+    summaries = item_db.read_item_summaries_by_ids([int(item_id) for item_id in ids_list])
+    return build_search_results(summaries, ids_list, distances, scores)
 
 
-def search_images_by_imgpath(item_db: ItemDB, vector_db: VectorDB, img_path: str, n: int = 10) -> pd.DataFrame:
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = HYBRID_SEARCH_RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuses several rankings of item IDs with reciprocal rank fusion.
+
+    Each item scores the sum of 1 / (k + rank) over the rankings it appears in,
+    so items ranked well by several retrievers rise to the top without having
+    to calibrate their scores against each other.
+
+    Args:
+        rankings (List[List[int]]): The rankings to fuse, best first.
+        k (int, optional): Damps the weight of the top ranks (default: HYBRID_SEARCH_RRF_K).
+
+    Returns:
+        List[Tuple[int, float]]: (item ID, fused score) tuples, best first.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0) + 1 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def fuse_with_lexical_results(
+    item_db: ItemDB, text: str, ids_list: List[str], distances: List[float], n: int = 10, filters: Optional[Dict] = None
+) -> List[SearchResult]:
+    """
+    Fuses the vector search results of a text query with a full text search of the item titles.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        text (str): The text description used for the search.
+        ids_list (List[str]): The IDs of the nearest neighbours, as returned by the vector database.
+        distances (List[float]): The distance of each ID in `ids_list` from the query.
+        n (int, optional): The number of results to return (default: 10).
+        filters (Optional[Dict], optional): The brand and scrape time filters, as keyword arguments of
+            `ItemDB.search_titles`.
+
+    Returns:
+        List[SearchResult]: The top n items of the fused ranking.
+    """
+    lexical_ids = [item_id for item_id, _ in item_db.search_titles(text, limit=HYBRID_SEARCH_CANDIDATES, **(filters or {}))]
+    return hydrate_search_results(item_db, *fuse_rankings(ids_list, distances, lexical_ids, n))
+
+
+def fuse_rankings(
+    ids_list: List[str], distances: List[float], lexical_ids: List[int], n: int = 10
+) -> Tuple[List[str], List[Optional[float]], List[float]]:
+    """
+    Fuses the vector search ranking of a text query with its full text search ranking.
+
+    Args:
+        ids_list (List[str]): The IDs of the nearest neighbours, as returned by the vector database.
+        distances (List[float]): The distance of each ID in `ids_list` from the query.
+        lexical_ids (List[int]): The IDs of the items whose title matches the query, best first.
+        n (int, optional): The number of items to keep (default: 10).
+
+    Returns:
+        Tuple[List[str], List[Optional[float]], List[float]]: The IDs of the top n items of the fused
+            ranking, their distances (None for items only found by the full text search) and fused scores.
+    """
+    fused = reciprocal_rank_fusion([[int(item_id) for item_id in ids_list], lexical_ids])[:n]
+    distance_by_id = {int(item_id): distance for item_id, distance in zip(ids_list, distances)}
+    return (
+        [str(item_id) for item_id, _ in fused],
+        [distance_by_id.get(item_id) for item_id, _ in fused],
+        [score for _, score in fused],
+    )
+
+
+def search_images_by_imgpath(item_db: ItemDB, vector_db: VectorDB, img_path: str, n: int = 10, filters: Optional[Dict] = None) -> List[SearchResult]:
     """
     Searches for similar images using a reference image path.
 
     This function searches for images in the vector database based on the similarity
-    to a provided image path. It retrieves data on the closest matches (n) from
-    the PostgreSQL database and returns a Pandas DataFrame.
+    to a provided image path and retrieves data on the closest matches (n) from
+    the PostgreSQL database.
 
     Args:
         item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
         vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
         img_path (str): The path to the reference image used for the search.
         n (int, optional): The number of closest matches to retrieve (default: 10).
+        filters (Optional[Dict], optional): The brand and scrape time filters, see `build_metadata_filter`.
 
     Returns:
-        pd.DataFrame: A Pandas DataFrame containing details about the similar images
-            found. Columns include ID, title, brand, URL, filepath, and distance (similarity score).
+        List[SearchResult]: Details about the similar images found, including ID, title, brand,
+            URL, filepath, and distance (similarity score).
     """
 
-    raw_result = vector_db.query_with_image(img_path, n=n)
-    result_df = query_image_from_sqldb(item_db, raw_result["ids"][0])
-    result_df["distance"] = raw_result["distances"][0]
-    return result_df
+    raw_result = vector_db.query_with_image(img_path, n=n, where=build_metadata_filter(**(filters or {})))
+    return hydrate_search_results(item_db, raw_result["ids"][0], raw_result["distances"][0])
 
 
-def search_images_by_text(item_db: ItemDB, vector_db: VectorDB, text: str, n: int = 10) -> pd.DataFrame:
+def search_images_by_text(item_db: ItemDB, vector_db: VectorDB, text: str, n: int = 10, filters: Optional[Dict] = None) -> List[SearchResult]:
     """
     Searches for similar images using a text description.
 
     This function searches for images in the vector database based on the similarity
-    to a provided image path. It retrieves data on the closest matches (n) from
-    the PostgreSQL database and returns a Pandas DataFrame.
+    to a provided text description, fuses them with a full text search of the item
+    titles, and retrieves data on the best matches (n) from the PostgreSQL database.
 
     Args:
         item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
         vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
         text (str): The text description used for the search.
         n (int, optional): The number of closest matches to retrieve (default: 10).
+        filters (Optional[Dict], optional): The brand and scrape time filters, see `build_metadata_filter`.
+
+    Returns:
+        List[SearchResult]: Details about the similar images found, including ID, title, brand,
+            URL, filepath, distance (similarity score) and fused score.
+    """
+    return search_images_by_text_embedding(item_db, vector_db, text, vector_db.embed_text(text), n, filters)
+
+
+def search_images_by_text_embedding(
+    item_db: ItemDB, vector_db: VectorDB, text: str, embedding: List[float], n: int = 10, filters: Optional[Dict] = None
+) -> List[SearchResult]:
+    """
+    Runs the hybrid search of a text query whose embedding is already computed.
+
+    The vector database is asked for HYBRID_SEARCH_CANDIDATES neighbours (or n
+    if larger), which are fused with the full text matches of the titles.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        text (str): The text description used for the search.
+        embedding (List[float]): The CLIP embedding of `text`.
+        n (int, optional): The number of closest matches to retrieve (default: 10).
+        filters (Optional[Dict], optional): The brand and scrape time filters, see `build_metadata_filter`.
+
+    Returns:
+        List[SearchResult]: The top n items of the fused ranking.
+    """
+    where = build_metadata_filter(**(filters or {}))
+    raw_result = vector_db.query_with_embeddings([embedding], n=max(n, HYBRID_SEARCH_CANDIDATES), where=where)
+    return fuse_with_lexical_results(item_db, text, raw_result["ids"][0], raw_result["distances"][0], n, filters)
+
+
+def search_images_by_embedding(
+    item_db: ItemDB, vector_db: VectorDB, embedding: List[float], n: int = 10, filters: Optional[Dict] = None
+) -> List[SearchResult]:
+    """
+    Searches for similar images using an already computed query embedding.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        embedding (List[float]): The CLIP embedding of the text or image query.
+        n (int, optional): The number of closest matches to retrieve (default: 10).
+        filters (Optional[Dict], optional): The brand and scrape time filters, see `build_metadata_filter`.
+
+    Returns:
+        List[SearchResult]: Details about the similar images found, including ID, title, brand,
+            URL, filepath, and distance (similarity score).
+    """
+    raw_result = vector_db.query_with_embeddings([embedding], n=n, where=build_metadata_filter(**(filters or {})))
+    return hydrate_search_results(item_db, raw_result["ids"][0], raw_result["distances"][0])
+
+
+def encode_search_results(results: List[SearchResult]) -> bytes:
+    """
+    Encodes search records as the JSON body of a search response.
+
+    Args:
+        results (List[SearchResult]): The records to encode.
+
+    Returns:
+        bytes: The UTF-8 encoded JSON list of records.
+    """
+    return json.dumps(jsonable_encoder(results), separators=(",", ":")).encode("utf-8")
+
+
+async def search_images(
+    item_db: ItemDB,
+    vector_db: VectorDB,
+    batchers: Dict[str, MicroBatcher],
+    cache: LRUCache,
+    query_type: str,
+    query: str,
+    n: int = 10,
+    filters: Optional[Dict] = None,
+) -> bytes:
+    """
+    Searches for similar images, serving repeated queries from memory.
+
+    The top-n response is cached as encoded JSON under the query, `n`, the
+    filters and the version of the vector collection, so a cache hit is
+    returned as is, without validating and serialising the records again.
+    The version is bumped whenever vectors are added, so cached results never
+    outlive an ETL run. On a cache miss, the query is embedded through the
+    micro-batcher of its type, so it shares one model call with concurrent
+    requests. Text queries are then answered by the hybrid lexical and vector
+    search.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        batchers (Dict[str, MicroBatcher]): The embedding micro-batchers, keyed by query type.
+        cache (LRUCache): The search result cache of the application, see `initialise_search_result_cache`.
+        query_type (str): Either "text" or "image".
+        query (str): The text description, or the path to the reference image.
+        n (int, optional): The number of closest matches to retrieve (default: 10).
+        filters (Optional[Dict], optional): The brand and scrape time filters, see `build_metadata_filter`.
+
+    Returns:
+        bytes: The JSON list of records of the similar images, each with its ID, title, brand, URL,
+            filepath and distance.
+    """
+    filters_key = json.dumps(filters, sort_keys=True, default=str)
+    if query_type == "text":
+        key = (query_type, normalise_query_text(query), n, filters_key, vector_db.version)
+    else:
+        key = (query_type, query, os.path.getmtime(query), n, filters_key, vector_db.version)
+
+    response = cache.get(key)
+    if response is None:
+        embedding = await batchers[query_type].submit(query)
+        if query_type == "text":
+            results = await run_in_threadpool(search_images_by_text_embedding, item_db, vector_db, query, embedding, n, filters)
+        else:
+            results = await run_in_threadpool(search_images_by_embedding, item_db, vector_db, embedding, n, filters)
+        response = encode_search_results(results)
+        cache.set(key, response)
+    return response
+
+
+class UnsearchableQueriesError(ValueError):
+    """
+    Raised when some queries of a batch cannot be embedded, e.g. an unreadable image.
+
+    Attributes:
+        positions (List[int]): The positions of the failing queries in the batch.
+    """
+
+    def __init__(self, positions: List[int]) -> None:
+        super().__init__(f"Cannot embed the queries at positions {positions}")
+        self.positions = positions
+
+
+def embed_queries(vector_db: VectorDB, queries: List[Tuple[str, str, Optional[Dict]]]) -> Dict[int, List[float]]:
+    """
+    Embeds the queries of a batch, all text queries and all image queries each as one batch.
+
+    If a batch fails, its queries are embedded one by one to find those that
+    cannot be embedded.
+
+    Args:
+        vector_db (VectorDB): An instance of the VectorDB class holding the embedding models.
+        queries (List[Tuple[str, str, Optional[Dict]]]): The (query type, query, filters) triples of the batch.
 
     Returns:
-        pd.DataFrame: A Pandas DataFrame containing details about the similar images
-            found. Columns include ID, title, brand, URL, filepath, and distance (similarity score).
+        Dict[int, List[float]]: The embedding of each query by position.
+
+    Raises:
+        UnsearchableQueriesError: If any of the queries cannot be embedded.
+    """
+    embeddings, failed = {}, []
+    for query_type, embed in (("text", vector_db.embed_texts), ("image", vector_db.embed_images)):
+        positions = [i for i, (type_, _, _) in enumerate(queries) if type_ == query_type]
+        if not positions:
+            continue
+        try:
+            embeddings.update(zip(positions, embed([queries[i][1] for i in positions])))
+            continue
+        except Exception as e:
+            print(f"batch {query_type} query embedding failed due to {type(e).__name__}, retrying queries individually")
+        for i in positions:
+            try:
+                embeddings[i] = embed([queries[i][1]])[0]
+            except Exception as e:
+                print(f"cannot embed query {i} due to {type(e).__name__}")
+                failed.append(i)
+    if failed:
+        raise UnsearchableQueriesError(sorted(failed))
+    return embeddings
+
+
+def search_images_batch(
+    item_db: ItemDB, vector_db: VectorDB, queries: List[Tuple[str, str, Optional[Dict]]], n: int = 10
+) -> List[List[SearchResult]]:
+    """
+    Searches for similar images for many queries at once.
+
+    All text queries and all image queries are each embedded as one batch.
+    Queries sharing a modality and filters are sent to the vector database as
+    one query. The full text matches of all text queries are read in one
+    round trip and fused in memory, then the hits of every query are hydrated
+    from the PostgreSQL database together in a single round trip.
+
+    Args:
+        item_db (ItemDB): An instance of the ItemDB class for interacting with the PostgreSQL database.
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        queries (List[Tuple[str, str, Optional[Dict]]]): (query type, query, filters) triples, where the
+            type is "text" or "image", the query is the text description or the path to the reference
+            image and the filters are the brand and scrape time filters or None.
+        n (int, optional): The number of closest matches to retrieve per query (default: 10).
+
+    Returns:
+        List[List[SearchResult]]: The similar images found for each query, in input order.
+
+    Raises:
+        UnsearchableQueriesError: If any of the queries cannot be embedded, naming every such query.
     """
-    raw_result = vector_db.query_with_text(text, n=n)
-    result_df = query_image_from_sqldb(item_db, raw_result["ids"][0])
-    result_df = result_df.reset_index(drop=True)
-    result_df["distance"] = raw_result["distances"][0]
-    return result_df
+    embeddings = embed_queries(vector_db, queries)
+    vector_results: Dict[int, Tuple[List[str], List[float]]] = {}
+    for query_type in ("text", "image"):
+        positions = [i for i, (type_, _, _) in enumerate(queries) if type_ == query_type]
+        groups: Dict[str, List[int]] = {}
+        for i in positions:
+            groups.setdefault(json.dumps(queries[i][2], sort_keys=True, default=str), []).append(i)
+        num_results = max(n, HYBRID_SEARCH_CANDIDATES) if query_type == "text" else n
+        for group in groups.values():
+            where = build_metadata_filter(**(queries[group[0]][2] or {}))
+            raw_result = vector_db.query_with_embeddings([embeddings[i] for i in group], n=num_results, where=where)
+            for i, ids_list, distances in zip(group, raw_result["ids"], raw_result["distances"]):
+                vector_results[i] = (ids_list, distances)
+
+    rankings = {i: (ids_list, distances, None) for i, (ids_list, distances) in vector_results.items()}
+    text_positions = [i for i, (query_type, _, _) in enumerate(queries) if query_type == "text"]
+    if text_positions:
+        lexical_results = item_db.search_titles_batch([(queries[i][1], queries[i][2] or {}) for i in text_positions], limit=HYBRID_SEARCH_CANDIDATES)
+        for i, matches in zip(text_positions, lexical_results):
+            rankings[i] = fuse_rankings(*vector_results[i], [item_id for item_id, _ in matches], n)
+
+    all_ids = {int(item_id) for ids_list, _, _ in rankings.values() for item_id in ids_list}
+    summaries = item_db.read_item_summaries_by_ids(list(all_ids))
+    return [build_search_results(summaries, *rankings[i]) for i in range(len(queries))]
@@ -13,12 +13,27 @@ POSTGRES_PWD = os.getenv("POSTGRES_PWD")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
 POSTGRES_DATABASE = os.getenv("POSTGRES_DB")
 POSTGRES_PORT = os.getenv("POSTGRES_PORT")
+POSTGRES_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", 5))
+POSTGRES_MAX_OVERFLOW = int(os.getenv("POSTGRES_MAX_OVERFLOW", 10))
+ITEM_CACHE_SIZE = int(os.getenv("ITEM_CACHE_SIZE", 10000))
 
 # APP
 IMAGE_DIR = os.getenv("IMAGE_DIR")
 WEBSCRAPER_CONFIG = os.getenv("WEBSCRAPER_CONFIG")
 WEBDRIVER_HOST = os.getenv("WEBDRIVER_HOST")
 WEBDRIVER_PORT = os.getenv("WEBDRIVER_PORT")
+SCRAPER_CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", 5))
+SCRAPER_TIMEZONE = os.getenv("SCRAPER_TIMEZONE") or "Asia/Singapore"
+ETL_QUEUE_SIZE = int(os.getenv("ETL_QUEUE_SIZE", 4))
+SCRAPER_WAIT_TIMEOUT = float(os.getenv("SCRAPER_WAIT_TIMEOUT", 10))
+SCRAPER_SCROLL_STABLE_MS = int(os.getenv("SCRAPER_SCROLL_STABLE_MS", 500))
+SCRAPER_HTTP_RETRIES = int(os.getenv("SCRAPER_HTTP_RETRIES", 3))
+HTML_PARSER = os.getenv("HTML_PARSER") or "lxml"
+DRIVER_MAX_PAGES = int(os.getenv("DRIVER_MAX_PAGES", 200))
+DRIVER_IDLE_TIMEOUT = float(os.getenv("DRIVER_IDLE_TIMEOUT", 240))
+IMAGE_DOWNLOAD_WORKERS = int(os.getenv("IMAGE_DOWNLOAD_WORKERS", 16))
+IMAGE_DOWNLOAD_RETRIES = int(os.getenv("IMAGE_DOWNLOAD_RETRIES", 3))
+IMAGE_DOWNLOAD_HOST_INTERVAL = float(os.getenv("IMAGE_DOWNLOAD_HOST_INTERVAL", 0.05))
 APP_PORT = os.getenv("APP_PORT")
 APP_HOST = os.getenv("APP_HOST")
 
@@ -28,6 +43,24 @@ HUGGINGFACE_API_KEY = os.getenv("HUGGINGFACE_API_KEY")
 VECTORDB_NAME = os.getenv("VECTORDB_NAME")
 VECTORDB_HOST = os.getenv("VECTORDB_HOST")
 VECTORDB_PORT = os.getenv("VECTORDB_PORT")
+VECTORDB_BATCH_SIZE = int(os.getenv("VECTORDB_BATCH_SIZE", 64))
+VECTORDB_MAX_ATTEMPTS = int(os.getenv("VECTORDB_MAX_ATTEMPTS", 3))
+VECTORDB_BACKEND = os.getenv("VECTORDB_BACKEND") or "chroma"
+VECTORDB_PATH = os.getenv("VECTORDB_PATH") or "vector_index"
+VECTORDB_EXACT_DTYPE = os.getenv("VECTORDB_EXACT_DTYPE") or "float32"
+VECTORDB_HNSW_EF = int(os.getenv("VECTORDB_HNSW_EF", 200))
+VECTORDB_RERANK_FACTOR = int(os.getenv("VECTORDB_RERANK_FACTOR", 4))
+CLIP_MODEL_NAME = os.getenv("CLIP_MODEL_NAME") or "ViT-B-32"
+CLIP_CHECKPOINT = os.getenv("CLIP_CHECKPOINT") or "laion2b_s34b_b79k"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or "embeddings.sqlite3"
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))
+QUERY_EMBEDDING_CACHE_TTL = float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", 0))
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv("SEARCH_RESULT_CACHE_SIZE", 1024))
+SEARCH_RESULT_CACHE_TTL = float(os.getenv("SEARCH_RESULT_CACHE_TTL", 0))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", 32))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", 5))
+HYBRID_SEARCH_CANDIDATES = int(os.getenv("HYBRID_SEARCH_CANDIDATES", 30))
+HYBRID_SEARCH_RRF_K = int(os.getenv("HYBRID_SEARCH_RRF_K", 60))
 
 if __name__ == "__main__":
     print(WEBSCRAPER_CONFIG)
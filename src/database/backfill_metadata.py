@@ -0,0 +1,72 @@
+import argparse
+from typing import List
+
+from .sql_models import ItemDB
+from .vector_models import VectorDB
+
+# the metadata keys the search filters read, see build_metadata_filter
+FILTER_KEYS = ("brand", "scraped_time")
+
+
+def find_ids_missing_metadata(vector_db: VectorDB, refresh_all: bool = False) -> List[str]:
+    """
+    Finds the stored vectors without the metadata the search filters read.
+
+    Vectors inserted before the brand and scrape time filters were added only
+    have a title in their metadata, so filtered searches never return them.
+
+    Args:
+        vector_db: The vector database to scan.
+        refresh_all: Return every stored vector, e.g. to rewrite scrape times computed from
+            the time zone-less scrape times stored before.
+
+    Returns:
+        The IDs of the vectors missing a filter key, or of all vectors.
+    """
+    stored = vector_db.get_all_data()
+    if refresh_all:
+        return list(stored["ids"])
+    return [vector_id for vector_id, metadata in zip(stored["ids"], stored["metadatas"]) if not all(key in (metadata or {}) for key in FILTER_KEYS)]
+
+
+def backfill_metadata(item_db: ItemDB, vector_db: VectorDB, batch_size: int = 1000, refresh_all: bool = False) -> int:
+    """
+    Copies the brand and scrape time of items from the SQL database into the metadata of their vectors.
+
+    Only the metadata is updated, so no image is embedded again. Items are read
+    and updated `batch_size` at a time, and the vector store is persisted at
+    the end.
+
+    Args:
+        item_db: The SQL database holding the items.
+        vector_db: The vector database to update.
+        batch_size: The number of vectors updated per call to the vector store.
+        refresh_all: Rewrite the metadata of every vector, not only of those missing it.
+
+    Returns:
+        The number of vectors updated.
+    """
+    missing_ids = find_ids_missing_metadata(vector_db, refresh_all)
+    num_updated = 0
+    for start in range(0, len(missing_ids), batch_size):
+        end = start + batch_size
+        items = item_db.read_item_by_ids([int(vector_id) for vector_id in missing_ids[start:end]])
+        if items:
+            vector_db.update_metadata(items)
+            num_updated += len(items)
+    vector_db.persist()
+    print(f"Updated the metadata of {num_updated} of {len(missing_ids)} vectors")
+    return num_updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add the brand and scrape time filter metadata to vectors stored without it.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--all", action="store_true", help="rewrite the metadata of every vector, e.g. after scrape times were fixed")
+    args = parser.parse_args()
+    item_db, vector_db = ItemDB(), VectorDB()
+    try:
+        backfill_metadata(item_db, vector_db, args.batch_size, refresh_all=args.all)
+    finally:
+        vector_db.close()
+        item_db.close()
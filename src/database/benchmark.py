@@ -0,0 +1,132 @@
+import argparse
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+from tabulate import tabulate
+
+from src.config import VECTORDB_BATCH_SIZE, VECTORDB_HNSW_EF
+
+from .vector_stores import (
+    ExactVectorStore,
+    HnswVectorStore,
+    QuantizedVectorStore,
+    VectorStore,
+)
+
+
+def make_embeddings(num_items: int, dim: int = 512, num_clusters: int = 100, seed: int = 0) -> np.ndarray:
+    """
+    Generates clustered random embeddings resembling a catalogue of similar products.
+
+    Args:
+        num_items: The number of embeddings.
+        dim: The embedding dimension (512 for CLIP ViT-B-32).
+        num_clusters: The number of clusters the embeddings are drawn around.
+        seed: The random seed.
+
+    Returns:
+        A (num_items, dim) float32 array.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(num_clusters, dim))
+    members = centres[rng.integers(num_clusters, size=num_items)]
+    return (members + 0.5 * rng.normal(size=(num_items, dim))).astype(np.float32)
+
+
+def fill_store(store: VectorStore, embeddings: np.ndarray, batch_size: int = VECTORDB_BATCH_SIZE) -> float:
+    """
+    Adds embeddings to a vector store in batches of the ETL's size and persists it.
+
+    Returns:
+        The number of seconds taken.
+    """
+    started = time.perf_counter()
+    for start in range(0, len(embeddings), batch_size):
+        end = start + batch_size
+        batch = embeddings[start:end]
+        ids = [str(i) for i in range(start, start + len(batch))]
+        store.add(ids=ids, embeddings=batch, metadatas=[{}] * len(batch), uris=[""] * len(batch))
+    store.persist()
+    return time.perf_counter() - started
+
+
+def measure(store: VectorStore, queries: np.ndarray, truth: List[List[str]], k: int) -> Dict[str, float]:
+    """
+    Measures recall@k and query latency of a vector store.
+
+    Args:
+        store: The filled vector store.
+        queries: The query embeddings.
+        truth: The exact top k IDs of each query.
+        k: The number of results per query.
+
+    Returns:
+        A dictionary with the recall, the median and 99th percentile latency of single
+        queries in milliseconds, and the latency per query of one batched query.
+    """
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        ids = store.query([query], n=k)["ids"][0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len(set(ids) & set(expected))
+    started = time.perf_counter()
+    store.query(queries, n=k)
+    batched = (time.perf_counter() - started) * 1000 / len(queries)
+    return {
+        "recall@k": hits / (k * len(queries)),
+        "p50 ms": float(np.percentile(latencies, 50)),
+        "p99 ms": float(np.percentile(latencies, 99)),
+        "batched ms/query": batched,
+    }
+
+
+def compare_stores(num_items: int = 50000, num_queries: int = 200, dim: int = 512, k: int = 10, ef: int = VECTORDB_HNSW_EF) -> List[Dict]:
+    """
+    Compares the exact, int8 quantised and HNSW stores on the same synthetic catalogue.
+
+    The float32 exact store provides the ground truth for recall.
+
+    Args:
+        num_items: The number of catalogue embeddings.
+        num_queries: The number of query embeddings.
+        dim: The embedding dimension.
+        k: The number of results per query.
+        ef: The HNSW query candidate list size.
+
+    Returns:
+        One row of results per store.
+    """
+    embeddings = make_embeddings(num_items, dim)
+    queries = make_embeddings(num_queries, dim, seed=1)
+    rows = []
+    truth = None
+    builders = {
+        "exact float32": lambda path: ExactVectorStore(path, dtype="float32"),
+        "exact float16": lambda path: ExactVectorStore(path, dtype="float16"),
+        "int8 rerank x4": lambda path: QuantizedVectorStore(path, rerank_factor=4),
+        "int8 rerank x1": lambda path: QuantizedVectorStore(path, rerank_factor=1),
+        f"hnsw ef={ef}": lambda path: HnswVectorStore(path, ef=ef),
+    }
+    for name, build in builders.items():
+        with tempfile.TemporaryDirectory() as path:
+            store = build(path)
+            build_seconds = fill_store(store, embeddings)
+            if truth is None:
+                truth = store.query(queries, n=k)["ids"]
+            rows.append({"store": name, "build s": build_seconds, **measure(store, queries, truth, k)})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare recall and latency of the local vector stores.")
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--ef", type=int, default=VECTORDB_HNSW_EF)
+    args = parser.parse_args()
+    results = compare_stores(args.items, args.queries, args.dim, args.k, args.ef)
+    print(tabulate(results, headers="keys", floatfmt=".3f"))
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded least recently used cache.
+
+    Entries can optionally expire after a time to live. Hit and miss counters
+    are kept so the effectiveness of the cache can be monitored.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        Initializes the LRUCache object.
+
+        Args:
+            maxsize: The maximum number of entries kept. A size of 0 disables caching.
+            ttl: Optional number of seconds after which an entry expires.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value cached under a key and marks it as recently used.
+
+        Args:
+            key: The key to look up.
+            default: The value returned when the key is missing or expired.
+
+        Returns:
+            The cached value, or `default`.
+        """
+        with self._lock:
+            value, expires_at = self._entries.get(key, (_MISSING, None))
+            if value is not _MISSING and expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                value = _MISSING
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Caches a value, evicting the least recently used entries when full.
+
+        Args:
+            key: The key to store the value under.
+            value: The value to cache.
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Removes a key from the cache if present.
+
+        Args:
+            key: The key to remove.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the size and hit/miss counters of the cache.
+
+        Returns:
+            A dictionary with the number of entries, hits and misses.
+        """
+        with self._lock:
+            return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
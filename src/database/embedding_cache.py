@@ -0,0 +1,95 @@
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from src.config import EMBEDDING_CACHE_PATH
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK_SIZE = 500
+
+
+def file_content_hash(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's bytes.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        The hex digest of the file content.
+    """
+    with open(path, "rb") as handler:
+        return hashlib.file_digest(handler, "sha256").hexdigest()
+
+
+class EmbeddingCache:
+    """
+    A persistent cache of image embeddings stored in a local SQLite database.
+
+    Embeddings are keyed by the content hash of the image and the name of the
+    model that produced them, so an image is only embedded once per model no
+    matter how many items, scrapes or vector databases it appears in.
+    """
+
+    def __init__(self, model_name: str, path: str = EMBEDDING_CACHE_PATH) -> None:
+        """
+        Initializes the EmbeddingCache object, creating the database if needed.
+
+        Args:
+            model_name: The name of the model producing the embeddings.
+            path: The path of the SQLite database file.
+        """
+        self.model_name = model_name
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embedding (content_hash TEXT NOT NULL, model TEXT NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (content_hash, model))"
+        )
+        self._connection.commit()
+        self._lock = threading.Lock()
+
+    def get_many(self, content_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """
+        Looks up the cached embeddings of several images.
+
+        Args:
+            content_hashes: The content hashes of the images.
+
+        Returns:
+            A dictionary mapping each cached content hash to its embedding.
+        """
+        content_hashes = list(content_hashes)
+        embeddings = {}
+        with self._lock:
+            for start in range(0, len(content_hashes), _QUERY_CHUNK_SIZE):
+                end = start + _QUERY_CHUNK_SIZE
+                chunk = content_hashes[start:end]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = self._connection.execute(
+                    f"SELECT content_hash, vector FROM embedding WHERE model = ? AND content_hash IN ({placeholders})",  # nosec B608
+                    [self.model_name, *chunk],
+                )
+                for content_hash, vector in rows:
+                    embeddings[content_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return embeddings
+
+    def put_many(self, embeddings: Dict[str, List[float]]) -> None:
+        """
+        Stores the embeddings of several images.
+
+        Args:
+            embeddings: A dictionary mapping content hashes to embeddings.
+        """
+        rows = [(content_hash, self.model_name, np.asarray(vector, dtype=np.float32).tobytes()) for content_hash, vector in embeddings.items()]
+        with self._lock:
+            self._connection.executemany("INSERT OR REPLACE INTO embedding (content_hash, model, vector) VALUES (?, ?, ?)", rows)
+            self._connection.commit()
+
+    def close(self) -> None:
+        """
+        Closes the database connection.
+        """
+        self._connection.close()
@@ -0,0 +1,39 @@
+from typing import List, Union
+
+from chromadb.api.types import Documents, Embeddings, Images, is_image
+from chromadb.utils.embedding_functions import OpenCLIPEmbeddingFunction
+
+
+class BatchedOpenCLIPEmbeddingFunction(OpenCLIPEmbeddingFunction):
+    """
+    An OpenCLIP embedding function that encodes its whole input as one batch.
+
+    chromadb's OpenCLIPEmbeddingFunction runs the model once per document or
+    image. This subclass stacks all texts and all images into one tensor per
+    modality, which is much cheaper per item on CPU.
+    """
+
+    def __call__(self, input: Union[Documents, Images]) -> Embeddings:
+        embeddings = [None] * len(input)
+        image_positions = [i for i, item in enumerate(input) if is_image(item)]
+        text_positions = [i for i, item in enumerate(input) if not is_image(item)]
+        if image_positions:
+            for i, embedding in zip(image_positions, self._encode_images([input[i] for i in image_positions])):
+                embeddings[i] = embedding
+        if text_positions:
+            for i, embedding in zip(text_positions, self._encode_texts([input[i] for i in text_positions])):
+                embeddings[i] = embedding
+        return embeddings
+
+    def _encode_images(self, images: Images) -> List[List[float]]:
+        pixels = self._torch.stack([self._preprocess(self._PILImage.fromarray(image)) for image in images])
+        with self._torch.no_grad():
+            features = self._model.encode_image(pixels)
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.tolist()
+
+    def _encode_texts(self, texts: Documents) -> List[List[float]]:
+        with self._torch.no_grad():
+            features = self._model.encode_text(self._tokenizer(texts))
+            features /= features.norm(dim=-1, keepdim=True)
+        return features.tolist()
@@ -1,29 +1,55 @@
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 
+import pytz
 from sqlalchemy import (
     Boolean,
     Column,
     DateTime,
+    Index,
     Integer,
     String,
+    cast,
+    column,
     create_engine,
+    func,
+    inspect,
+    or_,
+    select,
+    text,
+    true,
+    update,
+    values,
 )
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from src.config import (  # Import required variables from config.py
+    ITEM_CACHE_SIZE,
     POSTGRES_DATABASE,
     POSTGRES_HOST,
+    POSTGRES_MAX_OVERFLOW,
+    POSTGRES_POOL_SIZE,
     POSTGRES_PORT,
     POSTGRES_PWD,
     POSTGRES_USER,
+    SCRAPER_TIMEZONE,
+    VECTORDB_MAX_ATTEMPTS,
 )
 
+from .cache import LRUCache
+
 # Define database table model
 Base = declarative_base()
 
 
 class Item(Base):
     __tablename__ = "item"
+    __table_args__ = (
+        Index("uq_item_title_brand", "title", "brand", unique=True),
+        Index("ix_item_pending_vectordb", "id", postgresql_where=text("updated_vectordb IS NOT TRUE")),
+    )
 
     id = Column(Integer, primary_key=True)
     filepath = Column(String)
@@ -31,13 +57,35 @@ class Item(Base):
     url = Column(String)
     brand = Column(String)
     updated_vectordb = Column(Boolean)
-    scraped_time = Column(DateTime)
+    vectordb_attempts = Column(Integer)  # failed attempts to embed the image, NULL for none
+    scraped_time = Column(DateTime(timezone=True))  # the scraper records aware SCRAPER_TIMEZONE times
 
     def __repr__(self):
         return f"Item(id={self.id}, title='{self.title}',\
                 brand='{self.brand}')"
 
 
+# full text search document of an item; queries must use the same expression to be served by the GIN index
+title_tsvector = func.to_tsvector(text("'english'"), Item.title)
+Index("ix_item_title_fts", title_tsvector, postgresql_using="gin")
+
+
+def to_scraper_time(value: datetime) -> datetime:
+    """
+    Converts a search filter datetime to an aware time, comparable with `Item.scraped_time`.
+
+    Args:
+        value: The datetime to convert. Naive datetimes are read in SCRAPER_TIMEZONE, as `to_epoch_seconds`
+            reads them for the vector filters.
+
+    Returns:
+        The aware datetime.
+    """
+    if value.tzinfo is None:
+        return pytz.timezone(SCRAPER_TIMEZONE).localize(value)
+    return value
+
+
 class ItemDB:
     """
     A class for interacting with a PostgreSQL database containing item data.
@@ -50,13 +98,46 @@ class ItemDB:
         """
         Initializes the ItemDB object.
 
-        Args:
-            url: A SQLAlchemy connection URL string.
+        Creates a pooled SQLAlchemy engine which is meant to be built once per
+        process and shared, and makes sure the item table exists.
         """
         db_url = f"postgresql+psycopg2://{POSTGRES_USER}:{POSTGRES_PWD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DATABASE}"
-        self.engine = create_engine(db_url)
+        self.engine = create_engine(
+            db_url,
+            pool_size=POSTGRES_POOL_SIZE,
+            max_overflow=POSTGRES_MAX_OVERFLOW,
+            pool_pre_ping=True,
+        )
         Item.__table__.create(bind=self.engine, checkfirst=True)
+        self._add_missing_columns()
+        self._add_scraped_time_zone()
+        for index in Item.__table__.indexes:  # tables created before an index was added
+            index.create(bind=self.engine, checkfirst=True)
         self.Session = sessionmaker(bind=self.engine)
+        self.summary_cache = LRUCache(maxsize=ITEM_CACHE_SIZE)
+
+    def _add_missing_columns(self) -> None:
+        # tables created before a nullable column was added
+        existing = {info["name"] for info in inspect(self.engine).get_columns(Item.__tablename__)}
+        with self.engine.begin() as connection:
+            for item_column in Item.__table__.columns:
+                if item_column.name not in existing:
+                    column_type = item_column.type.compile(dialect=self.engine.dialect)
+                    connection.execute(text(f"ALTER TABLE {Item.__tablename__} ADD COLUMN IF NOT EXISTS {item_column.name} {column_type}"))
+
+    def _add_scraped_time_zone(self) -> None:
+        # tables created when scraped_time had no time zone hold the aware scrape times converted by
+        # Postgres to wall times of the session time zone, which are converted back here once
+        scraped_time = next(info for info in inspect(self.engine).get_columns(Item.__tablename__) if info["name"] == "scraped_time")
+        if getattr(scraped_time["type"], "timezone", False):
+            return
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"ALTER TABLE {Item.__tablename__} ALTER COLUMN scraped_time TYPE TIMESTAMP WITH TIME ZONE "
+                    "USING scraped_time AT TIME ZONE current_setting('TimeZone')"
+                )
+            )
 
     def create_item(self, item: Item) -> None:
         """
@@ -71,6 +152,40 @@ class ItemDB:
         # print(f"Item '{item}' added successfully!")
         session.close()
 
+    def bulk_insert_items(self, items: List[Dict[str, any]], chunk_size: int = 1000) -> Tuple[int, int]:
+        """
+        Inserts a batch of items, updating the image of those whose (title, brand) already exists.
+
+        Rows are written with chunked multi-row `INSERT ... ON CONFLICT DO UPDATE`
+        statements inside a single transaction, so deduplication is done by the
+        unique index rather than by a lookup per row. An existing item is only
+        updated when its image changed (a new content hash gives a new filepath):
+        the filepath is replaced and the item is queued for the vector database
+        again. Rows without an image never replace a stored one, since a failed
+        download should not hide an item from search.
+
+        Args:
+            items: A List of Dictionaries mapping Item column names to values.
+            chunk_size: The maximum number of rows sent in one statement.
+
+        Returns:
+            A Tuple with the number of inserted or updated items and the number of unchanged items skipped.
+        """
+        written_ids = []
+        with self.engine.begin() as connection:
+            for start in range(0, len(items), chunk_size):
+                end = start + chunk_size
+                statement = insert(Item).values(items[start:end])
+                statement = statement.on_conflict_do_update(
+                    index_elements=["title", "brand"],
+                    set_={"filepath": statement.excluded.filepath, "updated_vectordb": False, "vectordb_attempts": None},
+                    where=Item.filepath.is_distinct_from(statement.excluded.filepath) & (statement.excluded.filepath != ""),
+                ).returning(Item.id)
+                written_ids.extend(connection.execute(statement).scalars().all())
+        for item_id in written_ids:  # the cached summaries of updated items hold the old filepath
+            self.summary_cache.delete(item_id)
+        return len(written_ids), len(items) - len(written_ids)
+
     def read_item_by_ids(self, id_List: List[int]) -> List[Item]:
         """
         Retrieves items from the database based on a List of IDs.
@@ -86,6 +201,38 @@ class ItemDB:
         session.close()
         return items
 
+    def read_item_summaries_by_ids(self, id_List: List[int]) -> Dict[int, Row]:
+        """
+        Retrieves the fields needed to display search results for a List of IDs.
+
+        Only the id, title, brand, url and filepath columns are read, in a single
+        query for the IDs missing from the in-memory summary cache.
+
+        Args:
+            id_List: A List of integer IDs for the items to retrieve.
+
+        Returns:
+            A Dictionary mapping each found ID to a row with the id, title,
+            brand, url and filepath fields.
+        """
+        summaries = {}
+        missing_ids = []
+        for item_id in id_List:
+            summary = self.summary_cache.get(item_id)
+            if summary is None:
+                missing_ids.append(item_id)
+            else:
+                summaries[item_id] = summary
+
+        if missing_ids:
+            session = self.Session()
+            rows = session.query(Item.id, Item.title, Item.brand, Item.url, Item.filepath).filter(Item.id.in_(missing_ids)).all()
+            session.close()
+            for row in rows:
+                self.summary_cache.set(row.id, row)
+                summaries[row.id] = row
+        return summaries
+
     def read_items(self) -> List[Item]:
         """
         Retrieves all items from the database.
@@ -98,6 +245,64 @@ class ItemDB:
         session.close()
         return items
 
+    def iter_items_pending_vectordb(self, batch_size: int = 64, max_attempts: int = VECTORDB_MAX_ATTEMPTS) -> Iterator[List[Item]]:
+        """
+        Streams items that have an image but are not yet in the vector database, in id order.
+
+        Each batch is read with its own short-lived session using keyset
+        pagination on the id, and is served by the partial index on pending
+        items, so the cost depends on the number of new items only. Items whose
+        image failed to embed `max_attempts` times are left out.
+
+        Args:
+            batch_size: The maximum number of items in each batch.
+            max_attempts: The number of failed attempts after which an item is no longer returned.
+
+        Yields:
+            Lists of at most `batch_size` Item objects.
+        """
+        last_id = 0
+        while True:
+            session = self.Session()
+            batch = (
+                session.query(Item)
+                .filter(
+                    Item.updated_vectordb.isnot(True),
+                    Item.id > last_id,
+                    Item.filepath != "",
+                    func.coalesce(Item.vectordb_attempts, 0) < max_attempts,
+                )
+                .order_by(Item.id)
+                .limit(batch_size)
+                .all()
+            )
+            session.close()
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1].id
+
+    def mark_items_in_vectordb(self, id_List: List[int]) -> None:
+        """
+        Flags items as having been inserted into the vector database.
+
+        Args:
+            id_List: A List of integer IDs for the items to flag.
+        """
+        with self.engine.begin() as connection:
+            connection.execute(update(Item).where(Item.id.in_(id_List)).values(updated_vectordb=True))
+
+    def record_vectordb_failures(self, id_List: List[int]) -> None:
+        """
+        Counts a failed attempt to insert items into the vector database.
+
+        Args:
+            id_List: A List of integer IDs for the items whose image could not be embedded.
+        """
+        with self.engine.begin() as connection:
+            attempts = func.coalesce(Item.vectordb_attempts, 0) + 1
+            connection.execute(update(Item).where(Item.id.in_(id_List)).values(vectordb_attempts=attempts))
+
     def count_items(self) -> int:
         """
         Counts the number of items in the database.
@@ -110,6 +315,103 @@ class ItemDB:
         session.close()
         return count
 
+    def search_titles(
+        self,
+        query_text: str,
+        limit: int = 30,
+        brand: Optional[str] = None,
+        scraped_after: Optional[datetime] = None,
+        scraped_before: Optional[datetime] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Ranks items with an image by how well their title matches a text query.
+
+        The query is served by the full text GIN index on the title. Its words
+        are stemmed and OR-ed, so titles matching more of the words, closer
+        together, rank higher (`ts_rank_cd`).
+
+        Args:
+            query_text: The text query.
+            limit: The maximum number of items to return.
+            brand: Only return items of this brand.
+            scraped_after: Only return items scraped at or after this time.
+            scraped_before: Only return items scraped at or before this time.
+
+        Returns:
+            A List of (item ID, rank) tuples, best match first.
+        """
+        filters = {"brand": brand, "scraped_after": scraped_after, "scraped_before": scraped_before}
+        return self.search_titles_batch([(query_text, filters)], limit=limit)[0]
+
+    def search_titles_batch(self, queries: List[Tuple[str, Dict]], limit: int = 30) -> List[List[Tuple[int, float]]]:
+        """
+        Runs `search_titles` for many text queries in one round trip.
+
+        The queries are sent as a `VALUES` list joined `LATERAL` to the ranked
+        title matches of each, so every query still gets its own top `limit`
+        items from the full text index.
+
+        Args:
+            queries: (query text, filters) tuples, where the filters are the `brand`, `scraped_after`
+                and `scraped_before` keyword arguments of `search_titles` (any may be missing).
+            limit: The maximum number of items to return per query.
+
+        Returns:
+            A List of (item ID, rank) tuples per query, best match first, in input order.
+        """
+        if not queries:
+            return []
+        rows = []
+        for position, (query_text, filters) in enumerate(queries):
+            scraped_after, scraped_before = filters.get("scraped_after"), filters.get("scraped_before")
+            rows.append(
+                (
+                    position,
+                    query_text,
+                    filters.get("brand"),
+                    None if scraped_after is None else to_scraper_time(scraped_after),
+                    None if scraped_before is None else to_scraper_time(scraped_before),
+                )
+            )
+        query_values = values(
+            column("position", Integer),
+            column("query_text", String),
+            column("brand", String),
+            column("scraped_after", DateTime(timezone=True)),
+            column("scraped_before", DateTime(timezone=True)),
+            name="queries",
+        ).data(rows)
+        # the NULLs of a VALUES column without any value would be typed as text
+        scraped_after = cast(query_values.c.scraped_after, DateTime(timezone=True))
+        scraped_before = cast(query_values.c.scraped_before, DateTime(timezone=True))
+
+        lexemes = cast(func.plainto_tsquery(text("'english'"), query_values.c.query_text), String)
+        tsquery = func.to_tsquery(text("'simple'"), func.replace(lexemes, "&", "|"))
+        rank = func.ts_rank_cd(title_tsvector, tsquery).label("rank")
+        matches = (
+            select(Item.id, rank)
+            .where(
+                title_tsvector.op("@@")(tsquery),
+                Item.filepath != "",
+                or_(query_values.c.brand.is_(None), Item.brand == query_values.c.brand),
+                or_(scraped_after.is_(None), Item.scraped_time >= scraped_after),
+                or_(scraped_before.is_(None), Item.scraped_time <= scraped_before),
+            )
+            .order_by(rank.desc(), Item.id)
+            .limit(limit)
+            .lateral("matches")
+        )
+        statement = (
+            select(query_values.c.position, matches.c.id, matches.c.rank)
+            .select_from(query_values.join(matches, true()))
+            .order_by(query_values.c.position, matches.c.rank.desc(), matches.c.id)
+        )
+        results: List[List[Tuple[int, float]]] = [[] for _ in queries]
+        with self.engine.connect() as connection:
+            for row in connection.execute(statement):
+                results[row.position].append((row.id, row.rank))
+        return results
+
     def filter_items_by_charfields(self, criterias: Dict[str, str]) -> List[Item]:
         """
         Filters items based on criteria for character fields.
@@ -144,6 +446,7 @@ class ItemDB:
             for field, value in update_data.items():
                 setattr(item, field, value)
             session.commit()
+            self.summary_cache.delete(item_id)
             print(f"Item ID {item_id} updated successfully!")
         else:
             print(f"Item ID {item_id} not found!")
@@ -160,6 +463,7 @@ class ItemDB:
         item = session.get(Item, item_id)
         if isinstance(item, Item):
             session.delete(item)
+            self.summary_cache.delete(item_id)
             print(f"Item ID {item_id} deleted successfully!")
         else:
             print(f"Item ID {item_id} not available!")
@@ -174,11 +478,18 @@ class ItemDB:
         session = self.Session()
 
         session.query(Item).delete()
+        self.summary_cache.clear()
         print("deleting items db ....")
 
         session.commit()  # Commit the changes
         session.close()  # Close the session
 
+    def close(self) -> None:
+        """
+        Disposes of the connection pool held by the engine.
+        """
+        self.engine.dispose()
+
 
 if __name__ == "__main__":
     itemdb = ItemDB()
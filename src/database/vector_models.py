@@ -1,49 +1,127 @@
-from typing import Dict, List
+from datetime import datetime
+from typing import Dict, List, Optional
 
 import numpy as np
-from chromadb import HttpClient
+import pytz
 from chromadb.utils.data_loaders import ImageLoader
-from chromadb.utils.embedding_functions import (
-    HuggingFaceEmbeddingFunction,
-    OpenCLIPEmbeddingFunction,
-)
+from chromadb.utils.embedding_functions import HuggingFaceEmbeddingFunction
 from PIL import Image
 
 from src.config import (
+    CLIP_CHECKPOINT,
+    CLIP_MODEL_NAME,
     HUGGINGFACE_API_KEY,
     HUGGINGFACE_MODEL,
-    VECTORDB_HOST,
-    VECTORDB_NAME,
-    VECTORDB_PORT,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    QUERY_EMBEDDING_CACHE_TTL,
+    SCRAPER_TIMEZONE,
 )
 
+from .cache import LRUCache
+from .embedding_cache import EmbeddingCache, file_content_hash
+from .embeddings import BatchedOpenCLIPEmbeddingFunction
+from .vector_stores import create_vector_store
+
+
+def normalise_query_text(query_text: str) -> str:
+    """
+    Normalises a text query so equivalent phrasings share cache entries.
+
+    Args:
+        query_text: The raw text query.
+
+    Returns:
+        The lower-cased query with surrounding and repeated whitespace removed.
+    """
+    return " ".join(query_text.lower().split())
+
+
+def to_epoch_seconds(value: datetime) -> int:
+    """
+    Converts a datetime to seconds since the epoch, the form stored in vector metadata.
+
+    Naive datetimes, e.g. the times of search filters, are read in
+    SCRAPER_TIMEZONE, the time zone the scraper records `scraped_time` in.
+    Scrape times read from the items database are aware.
+
+    Args:
+        value: The datetime to convert.
+
+    Returns:
+        The number of whole seconds since the epoch.
+    """
+    if value.tzinfo is None:
+        value = pytz.timezone(SCRAPER_TIMEZONE).localize(value)
+    return int(value.timestamp())
+
+
+def build_item_metadata(item) -> Dict:
+    """
+    Builds the metadata stored with the vector of an item, which queries can be filtered on.
+
+    Args:
+        item: The Item the vector was embedded from.
+
+    Returns:
+        A dictionary with the title (the item ID), brand and scrape time in seconds since the epoch.
+    """
+    return {"title": item.id, "brand": item.brand, "scraped_time": to_epoch_seconds(item.scraped_time)}
+
+
+def build_metadata_filter(
+    brand: Optional[str] = None, scraped_after: Optional[datetime] = None, scraped_before: Optional[datetime] = None
+) -> Optional[Dict]:
+    """
+    Builds the `where` filter of a vector query from the search filters.
+
+    Args:
+        brand: Only return items of this brand.
+        scraped_after: Only return items scraped at or after this time.
+        scraped_before: Only return items scraped at or before this time.
+
+    Returns:
+        A chromadb style `where` filter, or None when no filter is set.
+    """
+    clauses = []
+    if brand is not None:
+        clauses.append({"brand": {"$eq": brand}})
+    if scraped_after is not None:
+        clauses.append({"scraped_time": {"$gte": to_epoch_seconds(scraped_after)}})
+    if scraped_before is not None:
+        clauses.append({"scraped_time": {"$lte": to_epoch_seconds(scraped_before)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
 
 class VectorDB:
     """
-    A class for interacting with a vector database using chromadb library.
+    A class for interacting with a vector database.
 
     This class provides methods to insert, query, and manage image data
-    represented as embeddings in the vector database.
+    represented as embeddings in the vector database. Embeddings are computed
+    here, while storage and nearest neighbour search are delegated to the
+    vector store selected by VECTORDB_BACKEND (the chromadb server by default).
     """
 
     def __init__(self) -> None:
         """
         Initializes the VectorDB object.
 
-        Sets up the embedding function, connects to the chromadb client,
-        and creates or retrieves the specified collection.
+        Sets up the embedding function and connects to the configured vector
+        store. Loading the CLIP weights is expensive, so one instance should be
+        shared per process.
         """
         self.embedding_function = HuggingFaceEmbeddingFunction(
             api_key=HUGGINGFACE_API_KEY,
             model_name=HUGGINGFACE_MODEL,
         )
-        self.client = HttpClient(host=VECTORDB_HOST, port=VECTORDB_PORT)
-        self.collection = self.client.get_or_create_collection(
-            name=VECTORDB_NAME,
-            metadata={"hnsw:space": "cosine"},
-            embedding_function=OpenCLIPEmbeddingFunction(),
-            data_loader=ImageLoader(),
-        )
+        self.clip_embedding_function = BatchedOpenCLIPEmbeddingFunction(model_name=CLIP_MODEL_NAME, checkpoint=CLIP_CHECKPOINT)
+        self.image_embedding_cache = EmbeddingCache(model_name=f"{CLIP_MODEL_NAME}/{CLIP_CHECKPOINT}")
+        self.data_loader = ImageLoader()
+        self.text_embedding_cache = LRUCache(maxsize=QUERY_EMBEDDING_CACHE_SIZE, ttl=QUERY_EMBEDDING_CACHE_TTL)
+        self.version = 0  # bumped whenever the stored vectors change
+        self.store = create_vector_store(embedding_function=self.clip_embedding_function, data_loader=self.data_loader)
 
     def get_all_data(self) -> Dict:
         """
@@ -53,12 +131,28 @@ class VectorDB:
         Returns:
             A dictionary containing lists of IDs and metadata for all entries.
         """
-        ids_results = self.collection.get()
+        ids_results = self.store.get_all()
         return ids_results
 
+    def get_stored_uris(self, ids: List[str]) -> Dict[str, str]:
+        """
+        Returns the image path each of the given IDs was embedded from, for the IDs already stored in the collection.
+
+        Args:
+            ids: A list of vector IDs to look up.
+
+        Returns:
+            A dictionary of vector ID to image path, for the subset of `ids` present in the collection.
+        """
+        return self.store.get_uris(ids)
+
     def insert_data(self, image_info_dict: List) -> None:
         """
-        Inserts image data into the vector database collection.
+        Inserts image data into the vector database collection, replacing the
+        embeddings already stored for the same items.
+
+        The brand and scrape time of each item are stored as metadata, so
+        queries can be filtered on them.
 
         Args:
             image_info_dict: A list of dictionaries containing
@@ -66,37 +160,133 @@ class VectorDB:
         """
         image_names = [img_info.filepath for img_info in image_info_dict]
         image_ids = [str(img_info.id) for img_info in image_info_dict]
-        image_metadata = [{"title": img_info.id} for img_info in image_info_dict]
-        self.collection.add(ids=image_ids, uris=image_names, metadatas=image_metadata)
+        image_metadata = [build_item_metadata(img_info) for img_info in image_info_dict]
+        image_embeddings = self.embed_image_files(image_names)
+        self.store.add(ids=image_ids, embeddings=image_embeddings, metadatas=image_metadata, uris=image_names)
+        self.version += 1
+
+    def update_metadata(self, items: List) -> None:
+        """
+        Rewrites the metadata of stored vectors from their items, without embedding the images again.
+
+        Args:
+            items: The Items whose stored vectors get the metadata of `build_item_metadata`.
+        """
+        self.store.update_metadata(ids=[str(item.id) for item in items], metadatas=[build_item_metadata(item) for item in items])
+        self.version += 1
+
+    def embed_image_files(self, image_paths: List[str]) -> List[List[float]]:
+        """
+        Embeds stored images, reusing embeddings of images with the same content.
+
+        Embeddings are looked up in the persistent image embedding cache by the
+        content hash of each file. Only images missing from the cache are
+        loaded and embedded, each distinct image once, and then cached.
+
+        Args:
+            image_paths: The paths of the images.
+
+        Returns:
+            The CLIP embedding of each image, in input order.
+        """
+        content_hashes = [file_content_hash(image_path) for image_path in image_paths]
+        embeddings = self.image_embedding_cache.get_many(set(content_hashes))
+        missing = {content_hash: image_path for content_hash, image_path in zip(content_hashes, image_paths) if content_hash not in embeddings}
+        if missing:
+            images = self.data_loader(list(missing.values()))
+            new_embeddings = dict(zip(missing.keys(), self.clip_embedding_function(images)))
+            self.image_embedding_cache.put_many(new_embeddings)
+            embeddings.update(new_embeddings)
+        return [embeddings[content_hash] for content_hash in content_hashes]
+
+    def embed_texts(self, query_texts: List[str]) -> List[List[float]]:
+        """
+        Embeds text queries, reusing cached embeddings of previous queries.
+
+        Queries missing from the cache are encoded together in one batch.
+
+        Args:
+            query_texts: The text queries to embed.
+
+        Returns:
+            The CLIP embedding of each normalised query text, in input order.
+        """
+        keys = [normalise_query_text(query_text) for query_text in query_texts]
+        embeddings = {key: self.text_embedding_cache.get(key) for key in set(keys)}
+        missing_keys = [key for key, embedding in embeddings.items() if embedding is None]
+        if missing_keys:
+            for key, embedding in zip(missing_keys, self.clip_embedding_function(missing_keys)):
+                self.text_embedding_cache.set(key, embedding)
+                embeddings[key] = embedding
+        return [embeddings[key] for key in keys]
+
+    def embed_text(self, query_text: str) -> List[float]:
+        """
+        Embeds a text query, reusing cached embeddings of previous queries.
+
+        Args:
+            query_text: The text query to embed.
+
+        Returns:
+            The CLIP embedding of the normalised query text.
+        """
+        return self.embed_texts([query_text])[0]
+
+    def embed_images(self, query_image_paths: List[str]) -> List[List[float]]:
+        """
+        Embeds query images together in one batch.
 
-    def query_with_text(self, query_text: str, n: int = 3) -> Dict:
+        Args:
+            query_image_paths: The paths to the query images.
+
+        Returns:
+            The CLIP embedding of each image, in input order.
+        """
+        query_images = [np.array(Image.open(query_image_path)) for query_image_path in query_image_paths]
+        return self.clip_embedding_function(query_images)
+
+    def query_with_embeddings(self, query_embeddings: List[List[float]], n: int = 3, where: Optional[Dict] = None) -> Dict:
+        """
+        Performs a query for one or more embeddings against the vector database.
+
+        Args:
+            query_embeddings: The embeddings to search with.
+            n: The maximum number of results to return per embedding (default: 3).
+            where: An optional metadata filter applied inside the search, see `build_metadata_filter`.
+
+        Returns:
+            A dictionary containing query results (distances and URIs), with one
+            list per query embedding.
+        """
+        return self.store.query(query_embeddings, n=n, where=where)
+
+    def query_with_text(self, query_text: str, n: int = 3, where: Optional[Dict] = None) -> Dict:
         """
         Performs a text query against the vector database.
 
         Args:
             query_text: The text query to use for searching.
             n: The maximum number of results to return (default: 3).
+            where: An optional metadata filter applied inside the search.
 
         Returns:
             A dictionary containing query results (distances and URIs).
         """
-        query_result = self.collection.query(query_texts=[query_text], include=["distances", "uris"], n_results=n)
-        return query_result
+        return self.query_with_embeddings([self.embed_text(query_text)], n=n, where=where)
 
-    def query_with_image(self, query_image_path: str, n: int = 3) -> Dict:
+    def query_with_image(self, query_image_path: str, n: int = 3, where: Optional[Dict] = None) -> Dict:
         """
         Performs an image query against the vector database.
 
         Args:
             query_image_path: The path to the query image.
             n: The maximum number of results to return (default: 3).
+            where: An optional metadata filter applied inside the search.
 
         Returns:
             A dictionary containing query results (distances and URIs).
         """
-        query_image = np.array(Image.open(query_image_path))
-        query_results = self.collection.query(query_images=[query_image], include=["distances", "uris"], n_results=n)
-        return query_results
+        return self.query_with_embeddings(self.embed_images([query_image_path]), n=n, where=where)
 
     def number_of_vectors(self) -> int:
         """
@@ -105,7 +295,7 @@ class VectorDB:
         Returns:
             The number of vectors stored in the vector database.
         """
-        return self.collection.count()
+        return self.store.count()
 
     def delete_vector_storage(self) -> None:
         """
@@ -115,11 +305,25 @@ class VectorDB:
         if len(all_ids) > 0:
             print("Number of vectors", len(all_ids), self.number_of_vectors())
             print(min(all_ids), max(all_ids))
-            self.client.delete_collection(VECTORDB_NAME)
+            self.store.delete_all()
             print("deleting collection in vectordb...")
+            self.version += 1
         else:
             print("No vectors in DB.")
 
+    def persist(self) -> None:
+        """
+        Writes the vectors the store only holds in memory to disk, e.g. at the end of an ETL run.
+        """
+        self.store.persist()
+
+    def close(self) -> None:
+        """
+        Persists the vector store and releases local resources held by the VectorDB object.
+        """
+        self.store.persist()
+        self.image_embedding_cache.close()
+
 
 if __name__ == "__main__":
     vectordb = VectorDB()
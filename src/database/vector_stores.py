@@ -0,0 +1,976 @@
+import itertools
+import json
+import numbers
+import os
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from chromadb import HttpClient
+
+from src.config import (
+    VECTORDB_BACKEND,
+    VECTORDB_EXACT_DTYPE,
+    VECTORDB_HNSW_EF,
+    VECTORDB_HOST,
+    VECTORDB_NAME,
+    VECTORDB_PATH,
+    VECTORDB_PORT,
+    VECTORDB_RERANK_FACTOR,
+)
+
+
+class VectorStore(ABC):
+    """
+    Interface of the storage and nearest neighbour search behind VectorDB.
+
+    A vector store keeps precomputed embeddings under string IDs, together
+    with their metadata and image URIs, and answers cosine distance queries
+    for one or more query embeddings. Query results follow chromadb's layout:
+    one list of IDs and one list of distances per query embedding. Queries
+    can be restricted with a chromadb style `where` filter on the metadata,
+    which is applied inside the search rather than to its results.
+    """
+
+    @abstractmethod
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], uris: List[str]) -> None:
+        """
+        Adds embeddings to the store, replacing those already stored under the same IDs.
+
+        Args:
+            ids: The ID of each embedding.
+            embeddings: The embeddings to add.
+            metadatas: The metadata of each embedding.
+            uris: The image URI of each embedding.
+        """
+
+    @abstractmethod
+    def query(self, query_embeddings: List[List[float]], n: int, where: Optional[Dict] = None) -> Dict:
+        """
+        Finds the nearest stored embeddings of each query embedding.
+
+        Args:
+            query_embeddings: The embeddings to search with.
+            n: The maximum number of results per query embedding.
+            where: An optional metadata filter, e.g. `{"brand": "Love Bonito"}`. Only matching
+                embeddings are returned.
+
+        Returns:
+            A dictionary with "ids" and "distances", each holding one list per query embedding.
+        """
+
+    @abstractmethod
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> None:
+        """
+        Replaces the metadata of stored embeddings, keeping the embeddings.
+
+        Args:
+            ids: The IDs of the stored embeddings to update.
+            metadatas: The new metadata of each embedding.
+        """
+
+    @abstractmethod
+    def get_uris(self, ids: List[str]) -> Dict[str, str]:
+        """
+        Returns the image URI of the given IDs that are stored.
+
+        Args:
+            ids: The IDs to look up.
+
+        Returns:
+            A dictionary of ID to image URI, for the subset of `ids` present in the store.
+        """
+
+    @abstractmethod
+    def get_all(self) -> Dict:
+        """
+        Returns the IDs and metadata of every stored embedding.
+
+        Returns:
+            A dictionary with "ids" and "metadatas" lists.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        """
+        Returns the number of stored embeddings.
+        """
+
+    @abstractmethod
+    def delete_all(self) -> None:
+        """
+        Removes every stored embedding.
+        """
+
+    def persist(self) -> None:
+        """
+        Writes the embeddings added since the last call to disk. Stores that persist
+        every `add` as it happens do nothing.
+        """
+
+
+class ChromaVectorStore(VectorStore):
+    """
+    A vector store backed by a collection on a chromadb server.
+    """
+
+    def __init__(self, embedding_function=None, data_loader=None) -> None:
+        """
+        Initializes the ChromaVectorStore object.
+
+        Connects to the chromadb server and creates or retrieves the configured collection.
+
+        Args:
+            embedding_function: The embedding function registered with the collection.
+            data_loader: The data loader registered with the collection.
+        """
+        self.embedding_function = embedding_function
+        self.data_loader = data_loader
+        self.client = HttpClient(host=VECTORDB_HOST, port=VECTORDB_PORT)
+        self.collection = self._get_collection()
+
+    def _get_collection(self):
+        return self.client.get_or_create_collection(
+            name=VECTORDB_NAME,
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=self.embedding_function,
+            data_loader=self.data_loader,
+        )
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], uris: List[str]) -> None:
+        self.collection.upsert(ids=ids, embeddings=embeddings, uris=uris, metadatas=metadatas)
+
+    def query(self, query_embeddings: List[List[float]], n: int, where: Optional[Dict] = None) -> Dict:
+        return self.collection.query(query_embeddings=query_embeddings, include=["distances", "uris"], n_results=n, where=where)
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> None:
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def get_uris(self, ids: List[str]) -> Dict[str, str]:
+        stored = self.collection.get(ids=ids, include=["uris"])
+        return dict(zip(stored["ids"], stored["uris"]))
+
+    def get_all(self) -> Dict:
+        return self.collection.get()
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def delete_all(self) -> None:
+        self.client.delete_collection(VECTORDB_NAME)
+        self.collection = self._get_collection()
+
+
+class _MetadataColumns:
+    """
+    The `brand` and `scraped_time` metadata of the stored positions as NumPy
+    arrays, so the search filters on them are evaluated with vectorised
+    comparisons instead of a scan over the metadata dicts. Missing brands are
+    None and missing times NaN; a key that ever held a value its array cannot
+    represent is left to `matches_where`.
+
+    The arrays grow by doubling and appends only write rows past the stored
+    length, so the views handed to snapshots never change. Updates are made on
+    a copy.
+    """
+
+    dtypes = {"brand": object, "scraped_time": np.float64}
+
+    def __init__(self) -> None:
+        self.size = 0
+        self.arrays = {key: np.empty(0, dtype=dtype) for key, dtype in self.dtypes.items()}
+        self.unsupported = set()
+
+    def append(self, metadatas: List[Dict]) -> None:
+        required = self.size + len(metadatas)
+        for key, array in self.arrays.items():
+            if required > len(array):
+                grown = np.empty(max(required, 2 * len(array), 1024), dtype=array.dtype)
+                grown[: self.size] = array[: self.size]
+                self.arrays[key] = array = grown
+            array[np.arange(self.size, required)] = [self._value(key, metadata) for metadata in metadatas]
+        self.size = required
+
+    def set(self, position: int, metadata: Dict) -> None:
+        for key, array in self.arrays.items():
+            array[position] = self._value(key, metadata)
+
+    def copy(self) -> "_MetadataColumns":
+        columns = _MetadataColumns()
+        columns.size = self.size
+        columns.arrays = {key: array.copy() for key, array in self.arrays.items()}
+        columns.unsupported = set(self.unsupported)
+        return columns
+
+    def view(self, num_rows: int) -> Dict[str, np.ndarray]:
+        return {key: array[:num_rows] for key, array in self.arrays.items() if key not in self.unsupported}
+
+    def _value(self, key: str, metadata: Dict):
+        value = metadata.get(key)
+        if self.arrays[key].dtype == object:
+            return value
+        if value is None:
+            return np.nan
+        if isinstance(value, bool) or not isinstance(value, numbers.Real):
+            self.unsupported.add(key)
+            return np.nan
+        return value
+
+
+class _Snapshot:
+    """
+    The stored positions a query searches: the first `num_rows` IDs and metadata,
+    the arrays holding their embeddings and the metadata columns of `_MetadataColumns`.
+    Positions whose embedding was replaced are False in `live`, which covers
+    the positions up to the last replacement. A new snapshot is published after
+    every write, so a query that reads it once sees consistent lengths while
+    embeddings are being added. The masks of the last `MASK_CACHE_SIZE` filters
+    are cached.
+    """
+
+    MASK_CACHE_SIZE = 32
+
+    def __init__(
+        self,
+        ids: List[str],
+        metadatas: List[Dict],
+        num_rows: int,
+        live: Optional[np.ndarray] = None,
+        num_replaced: int = 0,
+        matrix: Optional[np.ndarray] = None,
+        codes: Optional[np.ndarray] = None,
+        scale: Optional[np.ndarray] = None,
+        columns: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.ids = ids
+        self.metadatas = metadatas
+        self.num_rows = num_rows
+        self.live = live
+        self.num_replaced = num_replaced
+        self.matrix = matrix
+        self.codes = codes
+        self.scale = scale
+        self.columns = columns or {}
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._masks_lock = threading.Lock()
+
+    def positions(self) -> Iterator[int]:
+        for position in range(self.num_rows):
+            if self.live is None or position >= len(self.live) or self.live[position]:
+                yield position
+
+    def mask(self, where: Optional[Dict]) -> Optional[np.ndarray]:
+        if not where and self.live is None:
+            return None
+        key = json.dumps(where, sort_keys=True)
+        with self._masks_lock:
+            mask = self._masks.get(key)
+            if mask is not None:
+                self._masks.move_to_end(key)
+                return mask
+        mask = column_mask(self.columns, where, self.num_rows) if where else np.ones(self.num_rows, dtype=bool)
+        if mask is None:
+            metadatas = itertools.islice(self.metadatas, self.num_rows)
+            mask = np.fromiter((matches_where(metadata, where) for metadata in metadatas), dtype=bool, count=self.num_rows)
+        if self.live is not None:
+            mask[: len(self.live)] &= self.live
+        with self._masks_lock:
+            self._masks[key] = mask
+            while len(self._masks) > self.MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+        return mask
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Base class of the in-process vector stores persisted under a local directory.
+
+    It keeps the IDs, metadata and URIs of the stored embeddings in a JSON
+    lines sidecar file: a header with the dimension, then one line per
+    embedding, so adding embeddings only appends their lines. Adding an ID that
+    is already stored appends a new position and hides the old one, which is
+    how a changed image replaces its embedding. Metadata updates rewrite the
+    whole sidecar, so they are only written by `persist`. Queries search the
+    snapshot published after the last write, and metadata filters are
+    evaluated into a boolean mask over its positions, cached per snapshot;
+    filters on the brand and scrape time compare NumPy columns of them.
+    Writes are serialised by a lock per store.
+    """
+
+    def __init__(self, path: str = VECTORDB_PATH) -> None:
+        """
+        Initializes the LocalVectorStore object, loading the sidecar file if present.
+
+        Args:
+            path: The directory holding the index files.
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.entries_path = os.path.join(path, "entries.jsonl")
+        self.ids: List[str] = []
+        self.metadatas: List[Dict] = []
+        self.uris: List[str] = []
+        self.dim: Optional[int] = None
+        self._positions: Dict[str, int] = {}
+        self._live: Optional[np.ndarray] = None
+        self._num_replaced = 0
+        self._entries_unsaved = False
+        if os.path.isfile(self.entries_path):
+            self._load_entries()
+        self._index_positions(0)
+        self._columns = _MetadataColumns()
+        self._columns.append(self.metadatas)
+        self._lock = threading.RLock()
+        self._publish()
+
+    def _load_entries(self) -> None:
+        valid_size = 0
+        with open(self.entries_path, "rb") as handler:
+            for line in handler:
+                if not line.endswith(b"\n"):  # a write cut short
+                    break
+                entry = json.loads(line)
+                if "dim" in entry:
+                    self.dim = entry["dim"]
+                else:
+                    self.ids.append(entry["id"])
+                    self.metadatas.append(entry["metadata"])
+                    self.uris.append(entry["uri"])
+                valid_size += len(line)
+        if valid_size < os.path.getsize(self.entries_path):
+            os.truncate(self.entries_path, valid_size)
+
+    def _write_entries(self, handler, start: int) -> None:
+        if start == 0:
+            handler.write(json.dumps({"dim": self.dim}) + "\n")
+        for vector_id, metadata, uri in zip(self.ids[start:], self.metadatas[start:], self.uris[start:]):
+            handler.write(json.dumps({"id": vector_id, "metadata": metadata, "uri": uri}) + "\n")
+
+    def _save_entries(self) -> None:
+        with tempfile.NamedTemporaryFile("w", dir=self.path, suffix=".tmp", delete=False) as handler:
+            self._write_entries(handler, 0)
+        os.replace(handler.name, self.entries_path)
+
+    def _append_entries(self, ids: List[str], metadatas: List[Dict], uris: List[str], log: bool = False) -> None:
+        start = len(self.ids)
+        self.ids.extend(ids)
+        self.metadatas.extend(metadatas)
+        self.uris.extend(uris)
+        self._index_positions(start)
+        self._columns.append(metadatas)
+        if log:
+            with open(self.entries_path, "a") as handler:
+                self._write_entries(handler, start)
+
+    def _index_positions(self, start: int) -> None:
+        replaced = []
+        for position in range(start, len(self.ids)):
+            previous = self._positions.get(self.ids[position])
+            if previous is not None:
+                replaced.append(previous)
+            self._positions[self.ids[position]] = position
+        if replaced:
+            # a new array, so published snapshots keep their live positions
+            live = np.ones(len(self.ids), dtype=bool)
+            if self._live is not None:
+                live[: len(self._live)] = self._live
+            live[replaced] = False
+            self._live = live
+            self._num_replaced += len(replaced)
+
+    def _clear_entries(self) -> None:
+        # new lists, so published snapshots keep their entries
+        self.ids, self.metadatas, self.uris, self.dim = [], [], [], None
+        self._positions, self._live, self._num_replaced = {}, None, 0
+        self._columns = _MetadataColumns()
+
+    def _publish(self) -> None:
+        num_rows = len(self.ids)
+        self._snapshot = _Snapshot(
+            self.ids, self.metadatas, num_rows, live=self._live, num_replaced=self._num_replaced, columns=self._columns.view(num_rows)
+        )
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict]) -> None:
+        with self._lock:
+            # a new list, so published snapshots and their cached masks keep the previous metadata
+            self.metadatas = list(self.metadatas)
+            self._columns = self._columns.copy()
+            for vector_id, metadata in zip(ids, metadatas):
+                position = self._positions.get(vector_id)
+                if position is not None:
+                    self.metadatas[position] = metadata
+                    self._columns.set(position, metadata)
+            self._publish()
+            self._entries_unsaved = True
+
+    def persist(self) -> None:
+        with self._lock:
+            if self._entries_unsaved:
+                self._save_entries()
+                self._entries_unsaved = False
+
+    def get_uris(self, ids: List[str]) -> Dict[str, str]:
+        with self._lock:
+            return {vector_id: self.uris[self._positions[vector_id]] for vector_id in ids if vector_id in self._positions}
+
+    def get_all(self) -> Dict:
+        snapshot = self._snapshot
+        positions = list(snapshot.positions())
+        return {"ids": [snapshot.ids[position] for position in positions], "metadatas": [snapshot.metadatas[position] for position in positions]}
+
+    def count(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.num_rows - snapshot.num_replaced
+
+
+class HnswVectorStore(LocalVectorStore):
+    """
+    An in-process approximate nearest neighbour index built with hnswlib.
+
+    The index is persisted to disk and loaded at startup, which removes the
+    network hop and JSON encoding of the chromadb server from every query.
+    Labels in the index are positions in the list of stored IDs.
+
+    Saving the index writes the whole graph, so `add` only updates the index
+    in memory and `persist` saves it once an ETL run has finished (or at
+    shutdown); vectors added since the last save are lost if the process is
+    killed, and the store has to be rebuilt. hnswlib
+    does not allow adding or resizing while a query runs, so queries and
+    writes hold the store lock.
+    """
+
+    def __init__(self, path: str = VECTORDB_PATH, ef_construction: int = 200, M: int = 16, ef: int = VECTORDB_HNSW_EF) -> None:
+        """
+        Initializes the HnswVectorStore object, loading the index from disk if present.
+
+        Args:
+            path: The directory holding the index files.
+            ef_construction: The size of the candidate list used while building the index.
+            M: The number of links per element in the graph.
+            ef: The size of the candidate list used while querying; higher values trade latency for recall.
+        """
+        try:
+            import hnswlib
+        except ImportError:
+            raise ValueError("The hnswlib python package is not installed. Please install it with `pip install hnswlib`")
+        self._hnswlib = hnswlib
+        super().__init__(path)
+        self.ef_construction = ef_construction
+        self.M = M
+        self.ef = ef
+        self.index = None
+        index_path = os.path.join(path, "hnsw.bin")
+        if self.dim is not None and os.path.isfile(index_path):
+            self.index = self._hnswlib.Index(space="cosine", dim=self.dim)
+            self.index.load_index(index_path, max_elements=len(self.ids))
+            self.index.set_ef(self.ef)
+        self._unsaved = False
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], uris: List[str]) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.index is None:
+                self.dim = vectors.shape[1]
+                self.index = self._hnswlib.Index(space="cosine", dim=self.dim)
+                self.index.init_index(max_elements=max(len(ids), 1024), ef_construction=self.ef_construction, M=self.M)
+                self.index.set_ef(self.ef)
+            required = len(self.ids) + len(ids)
+            if required > self.index.get_max_elements():
+                self.index.resize_index(max(required, 2 * self.index.get_max_elements()))
+            self.index.add_items(vectors, np.arange(len(self.ids), required))
+            self._append_entries(ids, metadatas, uris)
+            self._publish()
+            self._unsaved = True
+
+    def persist(self) -> None:
+        with self._lock:
+            if self._unsaved:
+                with tempfile.NamedTemporaryFile(dir=self.path, suffix=".tmp", delete=False) as handler:
+                    index_tmp_path = handler.name
+                self.index.save_index(index_tmp_path)
+                os.replace(index_tmp_path, os.path.join(self.path, "hnsw.bin"))
+                self._entries_unsaved = True  # the sidecar lists the positions of the saved index
+                self._unsaved = False
+            super().persist()
+
+    def query(self, query_embeddings: List[List[float]], n: int, where: Optional[Dict] = None) -> Dict:
+        with self._lock:
+            snapshot = self._snapshot
+            mask = snapshot.mask(where)
+            k = min(n, snapshot.num_rows if mask is None else int(mask.sum()))
+            if k == 0:
+                return {"ids": [[] for _ in query_embeddings], "distances": [[] for _ in query_embeddings]}
+            self.index.set_ef(max(self.ef, k))
+            # the filter is checked while walking the graph, so filtered queries still return k results
+            label_filter = None if mask is None else mask.__getitem__
+            labels, distances = self.index.knn_query(np.asarray(query_embeddings, dtype=np.float32), k=k, filter=label_filter)
+            return {
+                "ids": [[snapshot.ids[label] for label in row] for row in labels.tolist()],
+                "distances": distances.tolist(),
+            }
+
+    def delete_all(self) -> None:
+        with self._lock:
+            self.index = None
+            self._clear_entries()
+            self._save_entries()
+            self._publish()
+            self._unsaved = False
+            index_path = os.path.join(self.path, "hnsw.bin")
+            if os.path.isfile(index_path):
+                os.remove(index_path)
+
+
+class ExactVectorStore(LocalVectorStore):
+    """
+    An exact nearest neighbour store searching a dense embedding matrix with NumPy.
+
+    Embeddings are L2 normalised and kept as a float32 (or float16) matrix in a
+    `.npy` file that is memory-mapped at startup, so cosine similarity is one
+    matrix product. Batched queries become a single matrix-matrix product and
+    the top n are selected with `argpartition`. For catalogues up to a few
+    hundred thousand items this is both exact and faster than an HNSW index
+    behind an HTTP server.
+
+    The file is preallocated with spare rows, so `add` writes only the new rows
+    and appends their sidecar lines, and every batch is on disk once `add`
+    returns. Rows are written before their sidecar lines, which tell how many
+    rows of the file are stored.
+    """
+
+    def __init__(self, path: str = VECTORDB_PATH, dtype: str = VECTORDB_EXACT_DTYPE, chunk_size: int = 65536) -> None:
+        """
+        Initializes the ExactVectorStore object, memory-mapping the matrix from disk if present.
+
+        Args:
+            path: The directory holding the matrix files.
+            dtype: The storage type of the matrix, "float32" or "float16".
+            chunk_size: The number of rows scored at once, bounding the temporary memory of a query.
+        """
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.matrix_path = os.path.join(path, "embeddings.npy")
+        self._matrix = np.load(self.matrix_path, mmap_mode="r+") if os.path.isfile(self.matrix_path) else None
+        super().__init__(path)
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], uris: List[str]) -> None:
+        vectors = normalise_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            self.dim = vectors.shape[1]
+            self._matrix = append_rows(self.matrix_path, self._matrix, len(self.ids), vectors.astype(self.dtype))
+            self._append_entries(ids, metadatas, uris, log=True)
+            self._publish()
+
+    def _publish(self) -> None:
+        num_rows = len(self.ids)
+        matrix = None if self._matrix is None else self._matrix[:num_rows]
+        self._snapshot = _Snapshot(
+            self.ids,
+            self.metadatas,
+            num_rows,
+            live=self._live,
+            num_replaced=self._num_replaced,
+            matrix=matrix,
+            columns=self._columns.view(num_rows),
+        )
+
+    def query(self, query_embeddings: List[List[float]], n: int, where: Optional[Dict] = None) -> Dict:
+        snapshot = self._snapshot
+        mask = snapshot.mask(where)
+        k = min(n, snapshot.num_rows if mask is None else int(mask.sum()))
+        if k == 0:
+            return {"ids": [[] for _ in query_embeddings], "distances": [[] for _ in query_embeddings]}
+        queries = normalise_rows(np.asarray(query_embeddings, dtype=np.float32))
+        rows, similarities = top_k_similarities(snapshot.matrix, queries, k, self.chunk_size, mask=mask)
+        return {
+            "ids": [[snapshot.ids[row] for row in query_rows] for query_rows in rows.tolist()],
+            "distances": (1 - similarities).tolist(),
+        }
+
+    def delete_all(self) -> None:
+        with self._lock:
+            self._matrix = None
+            self._clear_entries()
+            self._save_entries()
+            # queries still reading the old snapshot keep the removed file mapped
+            if os.path.isfile(self.matrix_path):
+                os.remove(self.matrix_path)
+            self._publish()
+
+
+class QuantizedVectorStore(ExactVectorStore):
+    """
+    An exact-reranked nearest neighbour store searching int8 quantised embeddings.
+
+    Each dimension of the normalised embeddings is scaled symmetrically into
+    int8, and a query only scans these codes, a quarter of the float32
+    footprint. It picks `rerank_factor` times `n` candidates from the codes,
+    then re-ranks them exactly against the full-precision matrix, so only
+    candidate rows of the matrix are read.
+
+    The scale is fitted on the first `scale_fit_rows` embeddings and then kept,
+    so `add` only encodes and appends the new rows (values beyond the fitted
+    range are clipped). While fewer embeddings are stored, the scale is
+    refitted and the few stored codes are rewritten on every add.
+    """
+
+    def __init__(
+        self, path: str = VECTORDB_PATH, rerank_factor: int = VECTORDB_RERANK_FACTOR, chunk_size: int = 8192, scale_fit_rows: int = 4096
+    ) -> None:
+        """
+        Initializes the QuantizedVectorStore object, loading or building the int8 codes.
+
+        Args:
+            path: The directory holding the matrix and code files.
+            rerank_factor: The number of candidates re-ranked per requested result.
+            chunk_size: The number of code rows scored at once, bounding the temporary memory of a query.
+            scale_fit_rows: The number of embeddings the per dimension scale is fitted on.
+        """
+        self.rerank_factor = rerank_factor
+        self.scale_fit_rows = scale_fit_rows
+        self.codes_path = os.path.join(path, "codes.npy")
+        self.scale_path = os.path.join(path, "scale.npy")
+        self._codes, self.scale = None, None
+        super().__init__(path, dtype="float32", chunk_size=chunk_size)
+        num_rows = len(self.ids)
+        if num_rows > 0:
+            if num_rows >= scale_fit_rows and os.path.isfile(self.codes_path) and os.path.isfile(self.scale_path):
+                self._codes, self.scale = np.load(self.codes_path, mmap_mode="r+"), np.load(self.scale_path)
+            else:
+                self._quantise(num_rows)
+            self._publish()
+
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[Dict], uris: List[str]) -> None:
+        vectors = normalise_rows(np.asarray(embeddings, dtype=np.float32))
+        with self._lock:
+            num_stored = len(self.ids)
+            self.dim = vectors.shape[1]
+            self._matrix = append_rows(self.matrix_path, self._matrix, num_stored, vectors)
+            if num_stored < self.scale_fit_rows:
+                self._quantise(num_stored + len(vectors))
+            else:
+                self._codes = append_rows(self.codes_path, self._codes, num_stored, quantise_rows(vectors, self.scale))
+            self._append_entries(ids, metadatas, uris, log=True)
+            self._publish()
+
+    def _publish(self) -> None:
+        num_rows = len(self.ids)
+        matrix = None if self._matrix is None else self._matrix[:num_rows]
+        codes = None if self._codes is None else self._codes[:num_rows]
+        self._snapshot = _Snapshot(
+            self.ids,
+            self.metadatas,
+            num_rows,
+            live=self._live,
+            num_replaced=self._num_replaced,
+            matrix=matrix,
+            codes=codes,
+            scale=self.scale,
+            columns=self._columns.view(num_rows),
+        )
+
+    def query(self, query_embeddings: List[List[float]], n: int, where: Optional[Dict] = None) -> Dict:
+        snapshot = self._snapshot
+        mask = snapshot.mask(where)
+        num_matching = snapshot.num_rows if mask is None else int(mask.sum())
+        k = min(n, num_matching)
+        if k == 0:
+            return {"ids": [[] for _ in query_embeddings], "distances": [[] for _ in query_embeddings]}
+        queries = normalise_rows(np.asarray(query_embeddings, dtype=np.float32))
+        num_candidates = min(num_matching, k * self.rerank_factor)
+        candidates, _ = top_k_similarities(snapshot.codes, queries * snapshot.scale, num_candidates, self.chunk_size, mask=mask)
+
+        vectors = np.asarray(snapshot.matrix[candidates.ravel()], dtype=np.float32).reshape(*candidates.shape, -1)
+        similarities = np.einsum("qcd,qd->qc", vectors, queries)
+        order = np.argsort(-similarities, axis=1)[:, :k]
+        rows = np.take_along_axis(candidates, order, axis=1)
+        return {
+            "ids": [[snapshot.ids[row] for row in query_rows] for query_rows in rows.tolist()],
+            "distances": (1 - np.take_along_axis(similarities, order, axis=1)).tolist(),
+        }
+
+    def delete_all(self) -> None:
+        with self._lock:
+            self._codes, self.scale = None, None
+            for file_path in (self.codes_path, self.scale_path):
+                if os.path.isfile(file_path):
+                    os.remove(file_path)
+            super().delete_all()
+
+    def _quantise(self, num_rows: int) -> None:
+        # symmetric per dimension scaling so the largest magnitude of the first rows maps to 127
+        matrix = self._matrix[:num_rows]
+        max_abs = np.zeros(matrix.shape[1], dtype=np.float32)
+        for start in range(0, min(num_rows, self.scale_fit_rows), self.chunk_size):
+            end = min(start + self.chunk_size, self.scale_fit_rows)
+            max_abs = np.maximum(max_abs, np.abs(matrix[start:end]).max(axis=0))
+        scale = np.where(max_abs == 0, 1, max_abs / 127).astype(np.float32)
+        # written to a new file, so queries on the published snapshot keep the previous codes
+        codes = None
+        for start in range(0, num_rows, self.chunk_size):
+            end = start + self.chunk_size
+            codes = append_rows(self.codes_path, codes, start, quantise_rows(matrix[start:end], scale), min_capacity=max(num_rows, 1024))
+        with tempfile.NamedTemporaryFile(dir=self.path, suffix=".npy", delete=False) as handler:
+            np.save(handler, scale)
+        os.replace(handler.name, self.scale_path)
+        self._codes, self.scale = codes, scale
+
+
+def quantise_rows(vectors: np.ndarray, scale: np.ndarray) -> np.ndarray:
+    """
+    Encodes vectors as int8 codes with a per dimension scale.
+
+    Args:
+        vectors: A 2D array of vectors.
+        scale: The value of one code step in each dimension.
+
+    Returns:
+        The int8 codes, clipped to [-127, 127].
+    """
+    return np.clip(np.rint(np.asarray(vectors, dtype=np.float32) / scale), -127, 127).astype(np.int8)
+
+
+def append_rows(path: str, array: Optional[np.ndarray], num_rows: int, rows: np.ndarray, min_capacity: int = 1024) -> np.ndarray:
+    """
+    Writes rows after the first `num_rows` rows of a `.npy` matrix file preallocated with spare rows.
+
+    Only the new rows are written while the file has room. When it is full, the
+    stored rows are copied into a new file of twice the capacity, which keeps
+    the total cost of appending linear in the number of rows. Memory maps of
+    the previous file stay valid for the queries still reading them.
+
+    Args:
+        path: The path of the matrix file.
+        array: The memory map of the file, or None if it does not exist yet.
+        num_rows: The number of rows of the file in use.
+        rows: The rows to write, in the dtype of the file.
+        min_capacity: The number of rows of a new file, at least.
+
+    Returns:
+        The memory map of the file, a new one if the file was grown.
+    """
+    required = num_rows + len(rows)
+    if array is None or required > array.shape[0]:
+        capacity = max(required, min_capacity, 0 if array is None else 2 * array.shape[0])
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".npy", delete=False) as handler:
+            tmp_path = handler.name
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=rows.dtype, shape=(capacity, rows.shape[1]))
+        if num_rows > 0:
+            grown[:num_rows] = array[:num_rows]
+        grown.flush()
+        del grown
+        os.replace(tmp_path, path)
+        array = np.load(path, mmap_mode="r+")
+    array[num_rows:required] = rows
+    array.flush()
+    return array
+
+
+def normalise_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Scales each row of a matrix to unit L2 norm.
+
+    Args:
+        vectors: A 2D array of vectors.
+
+    Returns:
+        The normalised vectors. All-zero rows are left unchanged.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def top_k_similarities(
+    matrix: np.ndarray, queries: np.ndarray, k: int, chunk_size: int = 65536, mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the k rows of a matrix with the highest dot product with each query.
+
+    The matrix is scored in chunks of rows, keeping only the best k candidates
+    of each chunk, so a memory-mapped float16 matrix is never converted to
+    float32 as a whole.
+
+    Args:
+        matrix: The (rows, dim) matrix to search.
+        queries: The (queries, dim) float32 query matrix.
+        k: The number of rows to return per query, at most the number of (unmasked) rows.
+        chunk_size: The number of rows scored at once.
+        mask: An optional boolean array over the rows; rows set to False are never returned.
+
+    Returns:
+        A tuple of (queries, k) arrays: the row indices and their similarities, best first.
+    """
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, matrix.shape[0], chunk_size):
+        end = start + chunk_size
+        scores = queries @ np.asarray(matrix[start:end], dtype=np.float32).T
+        if mask is not None:
+            scores[:, ~mask[start:end]] = -np.inf
+        if scores.shape[1] > k:
+            candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        best_rows = np.concatenate([best_rows, candidates + start], axis=1)
+        best_scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+        if best_rows.shape[1] > k:
+            keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+    order = np.argsort(-best_scores, axis=1)
+    return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def matches_where(metadata: Dict, where: Dict) -> bool:
+    """
+    Evaluates a chromadb style `where` filter against the metadata of one embedding.
+
+    Supports `$and`, `$or` and the `$eq`, `$ne`, `$gt`, `$gte`, `$lt`, `$lte`, `$in`
+    and `$nin` operators; a bare value is shorthand for `$eq`.
+
+    Args:
+        metadata: The metadata of the embedding.
+        where: The filter, e.g. `{"$and": [{"brand": "Love Bonito"}, {"scraped_time": {"$gte": 1700000000}}]}`.
+
+    Returns:
+        True if the metadata satisfies the filter.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand):
+                    return False
+    return True
+
+
+def column_mask(columns: Dict[str, np.ndarray], where: Dict, num_rows: int) -> Optional[np.ndarray]:
+    """
+    Evaluates a chromadb style `where` filter with vectorised comparisons of metadata columns.
+
+    Gives the same result as `matches_where` on every row, for the filters it
+    can evaluate: keys held in `columns`, ordering operators on numeric columns
+    only, and operands of a matching type.
+
+    Args:
+        columns: The metadata values of each row by key, see `_MetadataColumns`.
+        where: The filter.
+        num_rows: The number of rows.
+
+    Returns:
+        A boolean mask over the rows, or None if the filter cannot be evaluated on the columns.
+    """
+    mask = np.ones(num_rows, dtype=bool)
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            clause_masks = [column_mask(columns, clause, num_rows) for clause in condition]
+            if any(clause_mask is None for clause_mask in clause_masks):
+                return None
+            if key == "$and":
+                for clause_mask in clause_masks:
+                    mask &= clause_mask
+            else:
+                mask &= np.logical_or.reduce(clause_masks) if clause_masks else False
+            continue
+        column = columns.get(key)
+        if column is None:
+            return None
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            operator_mask = _compare_column(column, operator, operand)
+            if operator_mask is None:
+                return None
+            mask &= operator_mask
+    return mask
+
+
+def _compare_column(column: np.ndarray, operator: str, operand) -> Optional[np.ndarray]:
+    numeric = column.dtype != object
+    operands = operand if operator in ("$in", "$nin") else [operand]
+    if not isinstance(operands, (list, tuple)):
+        return None
+    for value in operands:
+        if value is None or isinstance(value, bool):
+            return None
+        if numeric and not isinstance(value, numbers.Real):
+            return None
+        if not numeric and not isinstance(value, (str, numbers.Real)):
+            return None
+    if operator == "$eq":
+        return column == operand
+    if operator == "$ne":
+        return column != operand
+    if operator == "$in":
+        return np.isin(column, list(operand))
+    if operator == "$nin":
+        return ~np.isin(column, list(operand))
+    if not numeric:
+        return None
+    if operator == "$gt":
+        return column > operand
+    if operator == "$gte":
+        return column >= operand
+    if operator == "$lt":
+        return column < operand
+    if operator == "$lte":
+        return column <= operand
+    return None
+
+
+def _compare(value, operator: str, operand) -> bool:
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported where operator {operator}")
+
+
+def create_vector_store(backend: str = VECTORDB_BACKEND, embedding_function=None, data_loader=None) -> VectorStore:
+    """
+    Builds the vector store selected by the configuration.
+
+    Args:
+        backend: "chroma" for the chromadb server (default), "hnsw" for the in-process hnswlib
+            index, "exact" for the in-process NumPy brute force search or "int8" for the
+            quantised NumPy search with exact re-ranking.
+        embedding_function: The embedding function registered with a chromadb collection.
+        data_loader: The data loader registered with a chromadb collection.
+
+    Returns:
+        The vector store.
+    """
+    if backend == "chroma":
+        return ChromaVectorStore(embedding_function=embedding_function, data_loader=data_loader)
+    if backend == "hnsw":
+        return HnswVectorStore()
+    if backend == "exact":
+        return ExactVectorStore()
+    if backend == "int8":
+        return QuantizedVectorStore()
+    raise ValueError(f"Invalid vector db backend: {backend}")
@@ -0,0 +1,145 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.config import (
+    IMAGE_DOWNLOAD_HOST_INTERVAL,
+    IMAGE_DOWNLOAD_RETRIES,
+    IMAGE_DOWNLOAD_WORKERS,
+)
+
+from .image_store import ImageStore
+from .product import Product
+
+
+def create_session(pool_size: int, retries: int) -> requests.Session:
+    """
+    Creates an HTTP session with a connection pool and retries with backoff.
+
+    Args:
+        pool_size: The number of keep-alive connections kept per host.
+        retries: The number of times a failed GET is retried, on connection errors and 429/5xx responses.
+
+    Returns:
+        The session.
+    """
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class ImageDownloader:
+    """
+    Downloads product images concurrently over a pooled HTTP session.
+
+    Requests reuse keep-alive connections, are retried with backoff on
+    connection errors and 429/5xx responses, and are spaced out per host.
+    Images are saved in a content-addressed ImageStore, and images already
+    stored are revalidated with a conditional request instead of refetched.
+    """
+
+    def __init__(
+        self,
+        image_store: Optional[ImageStore] = None,
+        max_workers: int = IMAGE_DOWNLOAD_WORKERS,
+        retries: int = IMAGE_DOWNLOAD_RETRIES,
+        min_host_interval: float = IMAGE_DOWNLOAD_HOST_INTERVAL,
+        timeout: float = 10,
+    ) -> None:
+        """
+        Initializes the ImageDownloader object.
+
+        Args:
+            image_store: The store to save images in (default: a store under IMAGE_DIR).
+            max_workers: The number of images downloaded at the same time.
+            retries: The number of times a failed request is retried.
+            min_host_interval: The minimum number of seconds between two requests to the same host.
+            timeout: The timeout of each request in seconds.
+        """
+        self.image_store = image_store or ImageStore()
+        self.max_workers = max_workers
+        self.min_host_interval = min_host_interval
+        self.timeout = timeout
+        self.session = create_session(max_workers, retries)
+        self._next_request_time = {}
+        self._lock = threading.Lock()
+
+    def download(self, url: str) -> str:
+        """
+        Downloads one image into the image store, unless the stored copy is still current.
+
+        Args:
+            url: The image URL.
+
+        Returns:
+            The path of the image in the image store.
+        """
+        self._wait_for_host(urlparse(url).netloc)
+        response = self.session.get(url, headers=self.image_store.conditional_headers(url), timeout=self.timeout)
+        if response.status_code == 304:
+            path = self.image_store.lookup(url)
+            if path is not None:
+                return path
+            response = self.session.get(url, timeout=self.timeout)  # stored copy removed since revalidation
+        response.raise_for_status()
+        return self.image_store.put(url, response.content, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+
+    def download_product_images(self, products: List[Product]) -> Tuple[int, int]:
+        """
+        Downloads the images of the given products concurrently.
+
+        Each distinct URL is fetched once and the products are pointed at the
+        stored image. Products whose image cannot be downloaded are marked as
+        having no image. The URL manifest is left to `save`.
+
+        Args:
+            products: The scraped products.
+
+        Returns:
+            A Tuple with the number of products whose image is available and the number that failed.
+        """
+        urls = list({prd.imgUrl for prd in products if prd.imgUrl})
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image-download") as executor:
+            paths = dict(zip(urls, executor.map(self._download_or_none, urls)))
+
+        num_downloaded = 0
+        for prd in products:
+            path = paths.get(prd.imgUrl)
+            if path is None:
+                prd.mark_image_missing()
+            else:
+                prd.imgName = path
+                num_downloaded += 1
+        return num_downloaded, len(products) - num_downloaded
+
+    def save(self) -> None:
+        """
+        Saves the URL manifest of the image store. It is rewritten whole, so
+        this is called once after all pages are downloaded, not per page.
+        """
+        self.image_store.save()
+
+    def _download_or_none(self, url: str) -> Optional[str]:
+        try:
+            return self.download(url)
+        except (requests.RequestException, OSError) as e:
+            print(f"cannot download image {url} due to {type(e).__name__}.")
+            return None
+
+    def _wait_for_host(self, host: str) -> None:
+        # reserve the next free slot for this host, then sleep until it comes
+        with self._lock:
+            now = time.monotonic()
+            request_time = max(now, self._next_request_time.get(host, now))
+            self._next_request_time[host] = request_time + self.min_host_interval
+        if request_time > now:
+            time.sleep(request_time - now)
@@ -0,0 +1,207 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from src.config import (
+    DRIVER_IDLE_TIMEOUT,
+    DRIVER_MAX_PAGES,
+    SCRAPER_CONCURRENCY,
+    SCRAPER_WAIT_TIMEOUT,
+    WEBDRIVER_HOST,
+    WEBDRIVER_PORT,
+)
+
+
+def create_remote_driver() -> WebDriver:
+    """
+    Opens a new Firefox session on the Selenium grid.
+
+    Returns:
+        The remote webdriver.
+    """
+    url = f"http://{WEBDRIVER_HOST}:{WEBDRIVER_PORT}"
+    # options = webdriver.ChromeOptions()
+    # options.add_argument('--no-sandbox')
+    # options.add_argument('--disable-dev-shm-usage')
+    # options.add_argument('--headless')
+    # options.add_argument('--disable-gpu')
+    # options.add_argument('--disable-extensions')
+    # options.add_argument('--remote-debugging-port=9222')
+    # options.add_argument('--log-level=DEBUG')
+    # options.add_argument('--enable-logging')
+    # options.add_argument('--disable-software-rasterizer')
+    # options.add_argument("--disable-notifications")
+    # options.add_argument("--disable-infobars")
+    options = webdriver.FirefoxOptions()
+    options.headless = False
+    driver = webdriver.Remote(url, options=options)
+    driver.set_script_timeout(SCRAPER_WAIT_TIMEOUT + 5)
+    return driver
+
+
+class _PooledDriver:
+    def __init__(self, driver: WebDriver) -> None:
+        self.driver = driver
+        self.pages = 0
+        self.released_at = time.monotonic()
+
+
+class DriverPool:
+    """
+    A pool of Selenium sessions shared by the scrapers of every ETL run.
+
+    Creating a session on the grid takes seconds, so sessions are kept open
+    between websites and runs. A session is checked with a cheap command
+    before it is handed out, and is replaced when the check fails, after it
+    served `max_pages` pages, after a scraping error, or when it sat idle
+    longer than `idle_timeout` (the grid drops idle sessions on its own).
+    """
+
+    def __init__(
+        self,
+        max_size: int = SCRAPER_CONCURRENCY,
+        max_pages: int = DRIVER_MAX_PAGES,
+        idle_timeout: float = DRIVER_IDLE_TIMEOUT,
+        create_driver: Callable[[], WebDriver] = create_remote_driver,
+    ) -> None:
+        """
+        Initializes the DriverPool object. Sessions are opened on first use.
+
+        Args:
+            max_size: The maximum number of open sessions, at most the sessions the grid allows.
+            max_pages: The number of pages after which a session is recycled.
+            idle_timeout: The number of seconds after which an idle session is recycled.
+            create_driver: Opens a new session.
+        """
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.idle_timeout = idle_timeout
+        self.create_driver = create_driver
+        self._idle: List[_PooledDriver] = []
+        self._in_use: Dict[int, _PooledDriver] = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self.counts = {"created": 0, "reused": 0, "recycled": 0}
+
+    def acquire(self, timeout: Optional[float] = None) -> WebDriver:
+        """
+        Hands out a healthy session, opening one if none is idle and the pool is not full.
+
+        Args:
+            timeout: The maximum number of seconds to wait for a session when all are in use.
+
+        Returns:
+            The webdriver, to be given back with `release`.
+
+        Raises:
+            TimeoutError: If no session became available within `timeout`.
+            RuntimeError: If the pool is closed.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._closed or self._idle or len(self._in_use) < self.max_size, timeout):
+                raise TimeoutError("No webdriver session available")
+            if self._closed:
+                raise RuntimeError("DriverPool is closed")
+            pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                # reserve the slot while the session is opened outside the lock
+                pooled = _PooledDriver(None)
+            self._in_use[id(pooled)] = pooled
+
+        if pooled.driver is not None and self._is_healthy(pooled):
+            self._increment("reused")
+            return pooled.driver
+        if pooled.driver is not None:
+            self._quit(pooled)
+        try:
+            pooled.driver = self.create_driver()
+        except Exception:
+            self._discard(pooled)
+            raise
+        pooled.pages = 0
+        self._increment("created")
+        return pooled.driver
+
+    def release(self, driver: WebDriver, pages: int = 0, failed: bool = False) -> None:
+        """
+        Gives a session back to the pool, recycling it if it failed or is worn out.
+
+        Args:
+            driver: The webdriver returned by `acquire`.
+            pages: The number of pages scraped with it since it was acquired.
+            failed: Whether scraping with it raised an error.
+        """
+        with self._condition:
+            pooled = next((pooled for pooled in self._in_use.values() if pooled.driver is driver), None)
+        if pooled is None:
+            return
+        pooled.pages += pages
+        if failed or self._closed or pooled.pages >= self.max_pages or not self._reset(pooled):
+            self._quit(pooled)
+            self._discard(pooled)
+            return
+        pooled.released_at = time.monotonic()
+        with self._condition:
+            del self._in_use[id(pooled)]
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the number of open sessions and how often sessions were created, reused and recycled.
+        """
+        with self._condition:
+            return {"idle": len(self._idle), "in_use": len(self._in_use), **self.counts}
+
+    def close(self) -> None:
+        """
+        Quits every idle session. Sessions in use are quit when released.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+    def _increment(self, name: str) -> None:
+        with self._condition:
+            self.counts[name] += 1
+
+    def _is_healthy(self, pooled: _PooledDriver) -> bool:
+        if time.monotonic() - pooled.released_at > self.idle_timeout:
+            return False
+        try:
+            pooled.driver.current_url
+        except WebDriverException:
+            return False
+        return True
+
+    def _reset(self, pooled: _PooledDriver) -> bool:
+        # leave only one blank window so the next website starts clean
+        try:
+            handles = pooled.driver.window_handles
+            for handle in handles[1:]:
+                pooled.driver.switch_to.window(handle)
+                pooled.driver.close()
+            pooled.driver.switch_to.window(handles[0])
+            pooled.driver.get("about:blank")
+        except WebDriverException:
+            return False
+        return True
+
+    def _quit(self, pooled: _PooledDriver) -> None:
+        self._increment("recycled")
+        try:
+            pooled.driver.quit()
+        except WebDriverException:
+            pass
+
+    def _discard(self, pooled: _PooledDriver) -> None:
+        with self._condition:
+            self._in_use.pop(id(pooled), None)
+            self._condition.notify()
@@ -1,7 +1,15 @@
-from typing import Dict, List, Optional
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from src.config import ETL_QUEUE_SIZE, SCRAPER_CONCURRENCY
 from src.database.sql_models import Item
 
+from .driver_pool import DriverPool
+from .http_scraper import HttpWebsiteScraper
+from .pipeline import put_unless_stopped
 from .product import (
     ACWProduct,
     LBProduct,
@@ -28,6 +36,24 @@ def load_product_class_into_config(config):
         raise ValueError(f"Invalid scraper class: {class_name}")
 
 
+def create_scraper(config: Dict[str, str], driver_pool: Optional[DriverPool] = None) -> WebsiteScraper:
+    """
+    Builds the scraper of a website for its configured `fetch_mode`.
+
+    Args:
+        config (Dict[str, str]): A website configuration, with its product class loaded. `fetch_mode` is
+            "http" for server-rendered websites fetched without a browser, or "selenium" (default).
+        driver_pool: The pool a Selenium scraper borrows its webdriver session from.
+
+    Returns:
+        WebsiteScraper: The scraper.
+    """
+    scraper_config = {key: value for key, value in config.items() if key != "fetch_mode"}
+    if config.get("fetch_mode", "selenium") == "http":
+        return HttpWebsiteScraper(**scraper_config)
+    return WebsiteScraper(**scraper_config, driver_pool=driver_pool)
+
+
 def scrape_product_from_website(config: Dict[str, str], pages=100) -> List[Item]:
     """
     Scrapes product information from a single website.
@@ -43,12 +69,94 @@ def scrape_product_from_website(config: Dict[str, str], pages=100) -> List[Item]
         List[Item]: A list of Items with scraped information.
     """
     config = load_product_class_into_config(config)
-    scraper = WebsiteScraper(**config)
+    scraper = create_scraper(config)
     products = scraper.get_all_product_info(max_pages=pages)
     print(f"Scrapped {len(products)} products from {config['base_url']}.")
     return products
 
 
+def iter_product_pages_from_website(config: Dict[str, str], pages=100, driver_pool: Optional[DriverPool] = None) -> Iterator[List[Product]]:
+    """
+    Scrapes product information from a single website, one page at a time.
+
+    Args:
+        config (Dict[str, str]): A dictionary containing website configuration.
+            Keys should include 'base_url' (the website's base URL).
+        pages: The maximum number of pages to scrape.
+        driver_pool: The pool to borrow a webdriver session from; a new session is opened if None.
+
+    Yields:
+        List[Product]: The products of each page.
+    """
+    config = load_product_class_into_config(config)
+    scraper = create_scraper(config, driver_pool)
+    num_products = 0
+    for page_products in scraper.iter_product_pages(max_pages=pages):
+        num_products += len(page_products)
+        yield page_products
+    print(f"Scrapped {num_products} products from {config['base_url']}.")
+
+
+def iter_scraped_pages(
+    website_configs,
+    pages: Optional[int] = 100,
+    max_workers: int = SCRAPER_CONCURRENCY,
+    maxsize: int = ETL_QUEUE_SIZE,
+    driver_pool: Optional[DriverPool] = None,
+) -> Iterator[Tuple[str, List[Product]]]:
+    """
+    Scrapes the given websites in parallel, yielding the products of each page as soon as it is parsed.
+
+    Each website is scraped in its own worker thread with its own scraper and
+    webdriver session, borrowed from `driver_pool` if given. Pages are handed over through a queue of at most
+    `maxsize` pages, so scrapers pause while the consumer is busy instead of
+    accumulating products. A website that fails is reported and skipped so
+    the other websites still load. Closing the generator stops the scrapers
+    after their current page.
+
+    Args:
+        website_configs: A dictionary of website name to configuration.
+        pages: The maximum number of pages to scrape for each website.
+        max_workers: The maximum number of websites scraped at the same time.
+        maxsize: The maximum number of scraped pages waiting to be consumed.
+        driver_pool: The pool of webdriver sessions shared by the scrapers.
+
+    Yields:
+        Tuples of the website name and the products of one of its pages.
+    """
+    page_queue: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def scrape(name: str, config: Dict[str, str]) -> None:
+        if stop.is_set():  # the consumer stopped before this website started
+            return
+        page_iterator = iter_product_pages_from_website(config, pages, driver_pool)
+        try:
+            for page_products in page_iterator:
+                if not put_unless_stopped(page_queue, (name, page_products), stop):
+                    return
+        except Exception as e:
+            print(traceback.format_exc())
+            print(f"cannot scrape website {name} due to {type(e).__name__}.")
+        finally:
+            page_iterator.close()
+            put_unless_stopped(page_queue, (name, None), stop)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scraper") as executor:
+        for name, config in website_configs.items():
+            executor.submit(scrape, name, config)
+        remaining = len(website_configs)
+        try:
+            while remaining > 0:
+                name, page_products = page_queue.get()
+                if page_products is None:  # the website is finished
+                    remaining -= 1
+                    continue
+                yield name, page_products
+        finally:
+            stop.set()
+
+
 def scrape_all_websites(website_configs, pages: Optional[int] = 100):
     """
     Scrapes product information from the given websites.
@@ -60,6 +168,6 @@ def scrape_all_websites(website_configs, pages: Optional[int] = 100):
     """
 
     product_info = []
-    for _, config in website_configs.items():
-        product_info += scrape_product_from_website(config, pages=pages)
+    for _, page_products in iter_scraped_pages(website_configs, pages=pages):
+        product_info += page_products
     return product_info
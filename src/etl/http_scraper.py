@@ -0,0 +1,117 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+# only HTML listing pages are parsed, which resolve no XML entities; BeautifulSoup cannot evaluate next_page_xpath
+import lxml.html  # nosec B410
+
+from src.config import SCRAPER_HTTP_RETRIES, SCRAPER_WAIT_TIMEOUT
+
+from .download import create_session
+from .product import Product
+from .scraper import WebsiteScraper
+
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64; rv:124.0) Gecko/20100101 Firefox/124.0"
+
+
+class HttpWebsiteScraper(WebsiteScraper):
+    """
+    A scraper for server-rendered websites that fetches listing pages over plain HTTP.
+
+    Listing pages are requested with a pooled requests session instead of a
+    browser, the pager link matched by `next_page_xpath` is followed
+    directly, and the products are parsed with the same Product classes as
+    the Selenium scraper. Each page is parsed once with lxml, and the tree is
+    used both to find the pager link and to cut out the product containers.
+    The next page is requested as soon as its link is known, so it downloads
+    while the current page is parsed and consumed.
+    """
+
+    def __init__(self, *args, timeout: float = SCRAPER_WAIT_TIMEOUT, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+        self.session = create_session(pool_size=2, retries=SCRAPER_HTTP_RETRIES)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+    def iter_product_pages(self, max_pages: Optional[int] = 100) -> Iterator[List[Product]]:
+        """
+        Extracts the product information of the website page by page over HTTP.
+
+        Args:
+            max_pages: The maximum number of pages to scrape.
+
+        Yields:
+            The products of each page.
+        """
+        visited_urls = set()
+        try:
+            if max_pages is not None and max_pages <= 0:
+                return
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-prefetch") as executor:
+                pending_page = executor.submit(self._fetch_page, self.base_url + self.url_product_prefix)
+                pg = 1
+                while pending_page is not None:
+                    page_url, page_source = pending_page.result()
+                    visited_urls.add(page_url)
+                    tree = lxml.html.fromstring(page_source)
+                    next_url = self._get_next_page_url(page_url, tree)
+                    if next_url is not None and next_url not in visited_urls and (max_pages is None or pg < max_pages):
+                        pending_page = executor.submit(self._fetch_page, next_url)
+                    else:
+                        pending_page = None
+
+                    page_products = self._get_products_from_page(self._get_product_html(tree))
+                    if len(page_products) == 0:
+                        break
+                    yield page_products
+                    print(page_url, len(page_products))
+                    pg += 1
+        finally:
+            self.session.close()
+
+    def _fetch_page(self, url: str) -> Tuple[str, str]:
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.url, response.text
+
+    def _get_product_html(self, tree: lxml.html.HtmlElement) -> str:
+        """
+        Serialises the product containers of a parsed page, so the Product classes only parse those.
+
+        Args:
+            tree: The parsed page.
+
+        Returns:
+            The HTML of the elements matching `product_tag` and `product_tag_attribute`, in document order.
+        """
+        attributes = dict(self.product_tag_attribute)
+        classes = set(attributes.pop("class", "").split())
+        containers = []
+        for element in tree.iter(self.product_tag):
+            if not classes.issubset(element.get("class", "").split()) or any(element.get(name) != value for name, value in attributes.items()):
+                continue
+            if containers and containers[-1] in element.iterancestors():  # already inside the previous container
+                continue
+            containers.append(element)
+        return "".join(lxml.html.tostring(element, encoding="unicode", with_tail=False) for element in containers)
+
+    def _get_next_page_url(self, page_url: str, tree: lxml.html.HtmlElement) -> Optional[str]:
+        """
+        Finds the absolute URL of the next listing page.
+
+        Args:
+            page_url: The URL of the current page, against which relative links are resolved.
+            tree: The parsed current page.
+
+        Returns:
+            The URL of the next page, or None on the last page.
+        """
+        if self.next_page_xpath == "":
+            return None
+        links = tree.xpath(self.next_page_xpath)
+        if len(links) == 0:
+            return None
+        href = links[0].get("href")
+        if not href or href.startswith(("#", "javascript:")):
+            return None
+        return urljoin(page_url, href)
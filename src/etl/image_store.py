@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from src.config import IMAGE_DIR
+
+# NamedTemporaryFile creates files readable by the owner only; stored files are readable by the app serving them
+FILE_MODE = 0o644
+
+
+class ImageStore:
+    """
+    A content-addressed store of product images under the image directory.
+
+    Images are saved under the SHA-256 hash of their bytes, so identical
+    images scraped from different URLs or products are stored once. A manifest
+    maps each image URL to its hash and to the HTTP validators (ETag and
+    Last-Modified) of the last response, so unchanged images can be
+    revalidated with a cheap conditional request.
+
+    The manifest is kept in memory and rewritten by `save`, which the ETL
+    calls once per run. If a run is killed before, its images stay on disk
+    but are downloaded again by the next run instead of revalidated.
+    """
+
+    def __init__(self, root: str = IMAGE_DIR, manifest_name: str = "manifest.json") -> None:
+        """
+        Initializes the ImageStore object and loads the URL manifest.
+
+        Args:
+            root: The directory holding the images.
+            manifest_name: The file name of the URL manifest inside `root`.
+        """
+        self.root = root
+        self.manifest_path = os.path.join(root, manifest_name)
+        self._manifest: Dict[str, Dict[str, Optional[str]]] = {}
+        if os.path.isfile(self.manifest_path):
+            with open(self.manifest_path) as json_file:
+                self._manifest = json.load(json_file)
+        self._unsaved = False
+        self._lock = threading.Lock()
+
+    def path_for(self, digest: str) -> str:
+        """
+        Returns the path of the image with the given content hash.
+
+        Args:
+            digest: The SHA-256 hex digest of the image bytes.
+
+        Returns:
+            The path of the image file.
+        """
+        return os.path.join(self.root, digest[:2], f"{digest}.jpg")
+
+    def lookup(self, url: str) -> Optional[str]:
+        """
+        Returns the path of the image last downloaded from a URL, if it is still on disk.
+
+        Args:
+            url: The image URL.
+
+        Returns:
+            The path of the stored image, or None.
+        """
+        with self._lock:
+            entry = self._manifest.get(url)
+        if entry is None:
+            return None
+        path = self.path_for(entry["sha256"])
+        return path if os.path.isfile(path) else None
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        Returns the headers revalidating the stored copy of an image.
+
+        Args:
+            url: The image URL.
+
+        Returns:
+            If-None-Match / If-Modified-Since headers, or an empty dictionary
+            when no copy of the image is stored.
+        """
+        if self.lookup(url) is None:
+            return {}
+        with self._lock:
+            entry = self._manifest[url]
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url: str, content: bytes, etag: Optional[str] = None, last_modified: Optional[str] = None) -> str:
+        """
+        Stores downloaded image bytes and records them against their URL.
+
+        The file is only written if no image with the same content exists, via
+        a temporary file renamed into place.
+
+        Args:
+            url: The image URL.
+            content: The image bytes.
+            etag: The ETag header of the response.
+            last_modified: The Last-Modified header of the response.
+
+        Returns:
+            The path of the stored image.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        if not os.path.isfile(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False) as handler:
+                handler.write(content)
+            os.chmod(handler.name, FILE_MODE)
+            os.replace(handler.name, path)
+        with self._lock:
+            self._manifest[url] = {"sha256": digest, "etag": etag, "last_modified": last_modified}
+            self._unsaved = True
+        return path
+
+    def save(self) -> None:
+        """
+        Writes the URL manifest to disk atomically, if it changed since it was last saved.
+        """
+        with self._lock:
+            if not self._unsaved:
+                return
+            manifest = dict(self._manifest)
+            self._unsaved = False
+        with tempfile.NamedTemporaryFile("w", dir=self.root, suffix=".tmp", delete=False) as handler:
+            json.dump(manifest, handler)
+        os.chmod(handler.name, FILE_MODE)
+        os.replace(handler.name, self.manifest_path)
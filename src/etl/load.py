@@ -1,61 +1,120 @@
-from typing import List
+from typing import List, Tuple
 
-from src.database.sql_models import (  # Assuming you have an Item model defined elsewhere
-    Item,
-    ItemDB,
-)
+from src.config import VECTORDB_BATCH_SIZE
+from src.database.sql_models import Item, ItemDB
 from src.database.vector_models import VectorDB
 
 from .product import Product
 
 
-def insert_items_into_sql(item_db: ItemDB, product_info: List[Product]) -> None:
+def insert_items_into_sql(item_db: ItemDB, product_info: List[Product]) -> Tuple[int, int]:
     """
     Inserts new items into the SQL database, avoiding duplicates.
 
+    Items sharing a title and brand with an existing row (or with an earlier
+    product in the same batch) are skipped, unless their image changed, in
+    which case the stored row takes the new image and is embedded again.
+
     Args:
         item_db (ProductDB): An instance of the ProductDB class for interacting with the database.
-        item_info (List[Item]): A list of Item objects representing the items to insert.
+        product_info (List[Product]): A list of scraped Product objects to insert.
 
     Returns:
-        None
+        Tuple[int, int]: The number of inserted or updated items and the number of skipped items.
     """
 
+    rows = {}
     for prd in product_info:
-        item = Item(
-            filepath=prd.imgName,
-            title=prd.title,
-            url=prd.url,
-            brand=prd.brand,
-            updated_vectordb=False,
-            scraped_time=prd.processed_time,
+        rows.setdefault(
+            (prd.title, prd.brand),
+            {
+                "filepath": prd.imgName,
+                "title": prd.title,
+                "url": prd.url,
+                "brand": prd.brand,
+                "updated_vectordb": False,
+                "scraped_time": prd.processed_time,
+            },
         )
-        # Check for existing item with same title and brand before inserting
-        item_attributes = {"title": item.title, "brand": item.brand}
-        existing_items = item_db.filter_items_by_charfields(item_attributes)
-        if not existing_items:
-            item_db.create_item(item)
+    inserted, skipped = item_db.bulk_insert_items(list(rows.values()))
+    skipped += len(product_info) - len(rows)
+    print(f"Inserted or updated {inserted} items in sql db, skipped {skipped} unchanged duplicates")
+    return inserted, skipped
+
+
+def insert_batch_into_vectordb(vector_db: VectorDB, items: List[Item]) -> List[int]:
+    """
+    Embeds and inserts one batch of items into the vector database.
+
+    If the batch fails (e.g. an unreadable image), the items are retried one
+    by one so a single bad file only drops that item.
+
+    Args:
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        items (List[Item]): The items to insert.
+
+    Returns:
+        List[int]: The IDs of the items that were inserted.
+    """
+    try:
+        vector_db.insert_data(items)
+        return [item.id for item in items]
+    except Exception as e:
+        print(f"batch insert into vectordb failed due to {type(e).__name__}, retrying items individually")
+
+    inserted_ids = []
+    for item in items:
+        try:
+            vector_db.insert_data([item])
+            inserted_ids.append(item.id)
+        except Exception as e:
+            print(f"cannot insert item {item.id} ({item.filepath}) into vectordb due to {type(e).__name__}")
+    return inserted_ids
 
 
 def insert_items_into_vectordb(
     item_db: ItemDB,
     vector_db: VectorDB,
-) -> None:
+    batch_size: int = VECTORDB_BATCH_SIZE,
+) -> int:
     """
     Inserts new item vectors into the vector database.
 
+    Only items whose `updated_vectordb` flag is not set are read, streamed from
+    the SQL database in id order and embedded one batch at a time, so the cost
+    is proportional to the number of new items and memory is bounded by
+    `batch_size`. Each batch is flagged as soon as it lands, so an interrupted
+    run resumes where it stopped. Items already present in the vector database
+    with the same image (e.g. inserted before the flag was maintained) are
+    flagged without being embedded again, while items whose image changed
+    since they were embedded have their embedding replaced. Items that fail
+    to embed have the failure counted, and are no longer read after
+    VECTORDB_MAX_ATTEMPTS failures, so an unreadable image is not retried for
+    every page an ETL run loads.
+
     Args:
         item_db (ProductDB): An instance of the ProductDB class for interacting with the database.
-        vector_operations (object): An object with methods to interact with the vector database.
-                                     (Specific type depends on your implementation)
+        vector_db (VectorDB): An instance of the VectorDB class for interacting with the vector database.
+        batch_size (int, optional): The number of items embedded per batch.
 
     Returns:
-        None
+        int: The number of items inserted into the vector database.
     """
 
-    existing_ids = set(vector_db.get_all_data()["ids"])
-    items_to_insert = [item for item in item_db.read_items() if (str(item.id) not in existing_ids) and (item.filepath != "")]
+    num_inserted = 0
+    for batch in item_db.iter_items_pending_vectordb(batch_size=batch_size):
+        stored_uris = vector_db.get_stored_uris([str(item.id) for item in batch])
+        existing_ids = [item.id for item in batch if stored_uris.get(str(item.id)) == item.filepath]
+        items_to_insert = [item for item in batch if stored_uris.get(str(item.id)) != item.filepath]
+        inserted_ids = insert_batch_into_vectordb(vector_db, items_to_insert) if items_to_insert else []
+        done_ids = inserted_ids + existing_ids
+        if done_ids:
+            item_db.mark_items_in_vectordb(done_ids)
+        inserted = set(inserted_ids)
+        failed_ids = [item.id for item in items_to_insert if item.id not in inserted]
+        if failed_ids:
+            item_db.record_vectordb_failures(failed_ids)
+        num_inserted += len(inserted_ids)
 
-    print(f"Inserting {len(items_to_insert)} items into vectordb")
-    if items_to_insert:
-        vector_db.insert_data(items_to_insert)
+    print(f"Inserted {num_inserted} items into vectordb")
+    return num_inserted
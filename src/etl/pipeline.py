@@ -0,0 +1,114 @@
+import queue
+import threading
+from contextlib import nullcontext
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from src.config import ETL_QUEUE_SIZE
+
+_DONE = object()  # marks the end of a stage's input
+
+
+def put_unless_stopped(buffer: queue.Queue, item: Any, stop: threading.Event, timeout: float = 0.5) -> bool:
+    """
+    Puts an item into a bounded queue, giving up if the consumer has stopped.
+
+    Args:
+        buffer: The queue to put the item into.
+        item: The item to put.
+        stop: Set by the consumer when it no longer reads from the queue.
+        timeout: How often, in seconds, the stop event is checked while the queue is full.
+
+    Returns:
+        True if the item was queued, False if the consumer stopped first.
+    """
+    while not stop.is_set():
+        try:
+            buffer.put(item, timeout=timeout)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_pipeline(
+    source: Iterable[Any],
+    stages: List[Tuple[str, Callable[[Any], Any]]],
+    maxsize: int = ETL_QUEUE_SIZE,
+    stage_context: Callable[[str], ContextManager] = lambda name: nullcontext(),
+    stop: Optional[threading.Event] = None,
+) -> None:
+    """
+    Streams items from a source through a chain of stages running concurrently.
+
+    Each stage runs in its own thread and passes what it returns to the next
+    stage through a queue holding at most `maxsize` items, so a slow stage
+    holds back the ones before it instead of letting work pile up in memory.
+    If a stage raises, the remaining input is drained without being processed
+    and the first error is raised once every stage has stopped. Setting `stop`
+    ends the run the same way, without an error.
+
+    Args:
+        source: The items to process, e.g. the products of each scraped page.
+        stages: (name, function) pairs, in order. Each function receives one item from the
+            previous stage and returns the item for the next one.
+        maxsize: The capacity of the queue in front of each stage.
+        stage_context: Builds a context manager wrapped around each stage's lifetime, e.g.
+            `Job.track_stage` to record stage timings.
+        stop: Set to stop reading the source and skip the items still queued, e.g. `Job.cancelled`.
+
+    Raises:
+        Exception: The first error raised by a stage.
+    """
+    errors: List[BaseException] = []
+    buffers = [queue.Queue(maxsize=maxsize) for _ in stages]
+
+    def stopped() -> bool:
+        return bool(errors) or (stop is not None and stop.is_set())
+
+    def work(name: str, process: Callable[[Any], Any], inbox: queue.Queue, outbox: Optional[queue.Queue]) -> None:
+        with stage_context(name):
+            while True:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                if stopped():
+                    continue
+                try:
+                    result = process(item)
+                except BaseException as e:
+                    errors.append(e)
+                    continue
+                if outbox is not None:
+                    outbox.put(result)
+        if outbox is not None:
+            outbox.put(_DONE)
+
+    threads = []
+    for i, (name, process) in enumerate(stages):
+        outbox = buffers[i + 1] if i + 1 < len(stages) else None
+        thread = threading.Thread(target=work, args=(name, process, buffers[i], outbox), name=f"etl-{name}", daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        for item in source:
+            if stopped():
+                break
+            buffers[0].put(item)
+    finally:
+        close_source = getattr(source, "close", None)  # stops a generator source early
+        if close_source is not None:
+            close_source()
+        buffers[0].put(_DONE)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
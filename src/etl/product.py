@@ -1,24 +1,44 @@
-import os
-
-import requests
-
-from src.config import IMAGE_DIR
-
-
 class Product:
 
+    # (tag, class) of the elements the setters read, by field name. They are
+    # collected in one traversal of the product element and passed to the
+    # setters, instead of each setter searching the element again.
+    field_tags = {}
+
     # The init method or constructor
     def __init__(self, product, processed_time, baseurl):
         # Instance Variable
         self.baseurl = baseurl
         self.processed_time = processed_time
-        self.title = product
-        self.url = product
-        self.price = product
-        self.imgName = self.title
-        self.imgUrl = product
+        fields = self.collect_fields(product)
+        self.title = fields
+        self.url = fields
+        self.price = None
+        self.imgName = ""
+        self.imgUrl = fields
         self.brand = None
 
+    @classmethod
+    def collect_fields(cls, product):
+        """
+        Collects the elements listed in `field_tags` in a single pass over the product element.
+
+        Args:
+            product: The BeautifulSoup element of one product.
+
+        Returns:
+            A dictionary of field name to the matching elements, in document order.
+        """
+        fields = {name: [] for name in cls.field_tags}
+        names = {tag_class: name for name, tag_class in cls.field_tags.items()}
+        for element in product.find_all(True):
+            for class_name in element.get("class", ()):
+                name = names.get((element.name, class_name))
+                if name is not None:
+                    fields[name].append(element)
+                    break
+        return fields
+
     # Title
     @property
     def baseurl(self):
@@ -54,30 +74,26 @@ class Product:
     @imgUrl.setter
     def imgUrl(self, product):
         self._img_url = product
-        self.download_image()
 
-    # Product image name/path
+    # Product image path in the image store, set once the image is downloaded
     @property
     def imgName(self):
         return self._image_name
 
     @imgName.setter
-    def imgName(self, title):
-        self._image_name = f'{IMAGE_DIR}/{title.replace(" ", "_").replace("/", "_")}.jpg'
-
-    def download_image(self):
-        # download image from url into given local path
-        if os.path.isfile(self.imgName):
-            # print(self.imgName, 'already downloaded!')
-            pass
-        else:
-            img_data = requests.get(self.imgUrl, timeout=10).content
-            with open(self.imgName, "wb") as handler:
-                handler.write(img_data)
+    def imgName(self, path):
+        self._image_name = path
+
+    def mark_image_missing(self):
+        # products without a usable image are kept out of the vector db
+        self._img_url = ""
+        self._image_name = ""
 
 
 class TWLProduct(Product):
 
+    field_tags = {"title": ("div", "product-title"), "images": ("img", "img-responsive")}
+
     # The init method or constructor
     def __init__(self, product, processed_time, baseurl):
         # Instance Variable
@@ -90,10 +106,8 @@ class TWLProduct(Product):
         return self._title
 
     @title.setter
-    def title(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        self._title = product.find(tag, attr).contents[1].text
+    def title(self, fields):
+        self._title = fields["title"][0].contents[1].text
 
     # Product URL
     @property
@@ -101,38 +115,27 @@ class TWLProduct(Product):
         return self._url
 
     @url.setter
-    def url(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        path = product.find(tag, attr).contents[1].get("href")
+    def url(self, fields):
+        path = fields["title"][0].contents[1].get("href")
         if self._baseurl in path:
             self._url = f"{path}"
         else:
             self._url = f"{self._baseurl}{path}"
 
-    @property
-    def imgName(self):
-        return self._image_name
-
-    @imgName.setter
-    def imgName(self, title):
-        self._image_name = f'{IMAGE_DIR}/{title.replace(" ", "_").replace("/", "_")}.jpg'
-
     # Product image url
     @property
     def imgUrl(self):
         return self._img_url
 
     @imgUrl.setter
-    def imgUrl(self, product):
-        tag = "img"
-        attr = {"class": "img-responsive"}
-        self._img_url = product.find_all(tag, attr)[-1].get("src")
-        self.download_image()
+    def imgUrl(self, fields):
+        self._img_url = fields["images"][-1].get("src")
 
 
 class SSDProduct(Product):
 
+    field_tags = {"title": ("div", "product-title"), "images": ("img", "img-fluid")}
+
     # The init method or constructor
     def __init__(self, product, processed_time, baseurl):
         # Instance Variable
@@ -145,10 +148,8 @@ class SSDProduct(Product):
         return self._title
 
     @title.setter
-    def title(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        self._title = product.find(tag, attr).contents[1].text
+    def title(self, fields):
+        self._title = fields["title"][0].contents[1].text
 
     # Product URL
     @property
@@ -156,39 +157,27 @@ class SSDProduct(Product):
         return self._url
 
     @url.setter
-    def url(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        path = product.find(tag, attr).contents[1].get("href")
+    def url(self, fields):
+        path = fields["title"][0].contents[1].get("href")
         if self._baseurl in path:
             self._url = f"{path}"
         else:
             self._url = f"{self._baseurl}{path}"
 
-    # Product image name/path
-    @property
-    def imgName(self):
-        return self._image_name
-
-    @imgName.setter
-    def imgName(self, title):
-        self._image_name = f'{IMAGE_DIR}/{title.replace(" ", "_").replace("/", "_")}.jpg'
-
     # Product image url
     @property
     def imgUrl(self):
         return self._img_url
 
     @imgUrl.setter
-    def imgUrl(self, product):
-        tag = "img"
-        attr = {"class": "img-fluid"}
-        self._img_url = product.find_all(tag, attr)[-1].get("src")
-        self.download_image()
+    def imgUrl(self, fields):
+        self._img_url = fields["images"][-1].get("src")
 
 
 class LBProduct(Product):
 
+    field_tags = {"title": ("p", "paragraph-2"), "link": ("a", "sf-product-card__link")}
+
     # The init method or constructor
     def __init__(self, product, processed_time, baseurl):
         # Instance Variable
@@ -201,10 +190,8 @@ class LBProduct(Product):
         return self._title
 
     @title.setter
-    def title(self, product):
-        tag = "p"
-        attr = {"class": "paragraph-2"}
-        self._title = product.find(tag, attr).contents[0].strip()
+    def title(self, fields):
+        self._title = fields["title"][0].contents[0].strip()
 
     # Product URL
     @property
@@ -212,49 +199,39 @@ class LBProduct(Product):
         return self._url
 
     @url.setter
-    def url(self, product):
-        tag = "a"
-        attr = {"class": "sf-product-card__link"}
-        path = product.find(tag, attr).get("href")
+    def url(self, fields):
+        path = fields["link"][0].get("href")
         if self._baseurl in path:
             self._url = f"{path}"
         else:
             self._url = f"{self._baseurl}{path}"
 
-    # Product image name/path
-    @property
-    def imgName(self):
-        return self._image_name
-
-    @imgName.setter
-    def imgName(self, title):
-        self._image_name = f'{IMAGE_DIR}/{title.replace(" ", "_").replace("/", "_")}.jpg'
-
     # Product image url
     @property
     def imgUrl(self):
         return self._img_url
 
     @imgUrl.setter
-    def imgUrl(self, product):
-        tag = "a"
-        attr = {"class": "sf-product-card__link"}
+    def imgUrl(self, fields):
         try:
-            img = product.find(tag, attr).contents[0].find("img")
+            link = fields["link"][0]
+            img = link.contents[0].find("img")
             if img is not None:
                 img_src = img.get("src")
                 if img_src is not None:
                     self._img_url = img_src
                 else:
-                    self._img_url = product.find(tag, attr).contents[6].get("href")
-            self.download_image()
+                    self._img_url = link.contents[6].get("href")
+            else:
+                self.mark_image_missing()
         except IndexError:
-            self._img_url = ""
-            self._image_name = ""
+            self.mark_image_missing()
 
 
 class ACWProduct(Product):
 
+    field_tags = {"title": ("div", "product-title"), "images": ("img", "img-responsive")}
+
     # The init method or constructor
     def __init__(self, product, processed_time, baseurl):
         # Instance Variable
@@ -267,10 +244,8 @@ class ACWProduct(Product):
         return self._title
 
     @title.setter
-    def title(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        self._title = product.find(tag, attr).contents[1].text
+    def title(self, fields):
+        self._title = fields["title"][0].contents[1].text
 
     # Product URL
     @property
@@ -278,39 +253,27 @@ class ACWProduct(Product):
         return self._url
 
     @url.setter
-    def url(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        path = product.find(tag, attr).contents[1].get("href")
+    def url(self, fields):
+        path = fields["title"][0].contents[1].get("href")
         if self._baseurl in path:
             self._url = f"{path}"
         else:
             self._url = f"{self._baseurl}{path}"
 
-    # Product image name/path
-    @property
-    def imgName(self):
-        return self._image_name
-
-    @imgName.setter
-    def imgName(self, title):
-        self._image_name = f'{IMAGE_DIR}/{title.replace(" ", "_").replace("/", "_")}.jpg'
-
     # Product image url
     @property
     def imgUrl(self):
         return self._img_url
 
     @imgUrl.setter
-    def imgUrl(self, product):
-        tag = "img"
-        attr = {"class": "img-responsive"}
-        self._img_url = product.find_all(tag, attr)[-1].get("src")
-        self.download_image()
+    def imgUrl(self, fields):
+        self._img_url = fields["images"][-1].get("src")
 
 
 class TTRProduct(Product):
 
+    field_tags = {"title": ("div", "product-title"), "images": ("img", "img-fluid")}
+
     # The init method or constructor
     def __init__(self, product, processed_time, baseurl):
         # Instance Variable
@@ -323,10 +286,8 @@ class TTRProduct(Product):
         return self._title
 
     @title.setter
-    def title(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        self._title = product.find(tag, attr).contents[1].text
+    def title(self, fields):
+        self._title = fields["title"][0].contents[1].text
 
     # Product URL
     @property
@@ -334,37 +295,21 @@ class TTRProduct(Product):
         return self._url
 
     @url.setter
-    def url(self, product):
-        tag = "div"
-        attr = {"class": "product-title"}
-        path = product.find(tag, attr).contents[1].get("href")
+    def url(self, fields):
+        path = fields["title"][0].contents[1].get("href")
         if self._baseurl in path:
             self._url = f"{path}"
         else:
             self._url = f"{self._baseurl}{path}"
 
-    # Product image name/path
-    @property
-    def imgName(self):
-        return self._image_name
-
-    @imgName.setter
-    def imgName(self, title):
-        self._image_name = f'{IMAGE_DIR}/{title.replace(" ", "_").replace("/", "_")}.jpg'
-
     # Product image url
     @property
     def imgUrl(self):
         return self._img_url
 
     @imgUrl.setter
-    def imgUrl(self, product):
-        tag = "img"
-        attr = {"class": "img-fluid"}
+    def imgUrl(self, fields):
         try:
-            self._img_url = product.find_all(tag, attr)[-1].get("src")
-            self.download_image()
+            self._img_url = fields["images"][-1].get("src")
         except IndexError:
-            self._img_url = ""
-            self._image_name = ""
-            pass  # skip products without an image
+            self.mark_image_missing()  # skip products without an image
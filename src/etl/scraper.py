@@ -1,26 +1,85 @@
-import time
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 
 import pytz
-from bs4 import BeautifulSoup
-from selenium import webdriver
+from bs4 import BeautifulSoup, SoupStrainer
 from selenium.common.exceptions import (
     JavascriptException,
     NoSuchElementException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
 )
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions
+from selenium.webdriver.support.ui import WebDriverWait
 
-from src.config import WEBDRIVER_HOST, WEBDRIVER_PORT
+from src.config import (
+    HTML_PARSER,
+    SCRAPER_SCROLL_STABLE_MS,
+    SCRAPER_TIMEZONE,
+    SCRAPER_WAIT_TIMEOUT,
+)
 
+from .driver_pool import DriverPool, create_remote_driver
 from .product import Product
 
+# Scrolls one viewport at a time until the bottom of the page is reached and
+# neither the page height nor the number of products has changed for
+# `stableMs`, then calls back with the number of products. Runs in the page,
+# so the whole scroll is a single WebDriver round trip.
+SCROLL_UNTIL_STABLE_SCRIPT = """
+var selector = arguments[0], stableMs = arguments[1], maxMs = arguments[2], stepMs = arguments[3];
+var done = arguments[arguments.length - 1];
+var started = Date.now(), lastChange = Date.now(), lastHeight = -1, lastCount = -1;
+function step() {
+    var height = document.body ? document.body.scrollHeight : 0;
+    var count = document.querySelectorAll(selector).length;
+    if (height !== lastHeight || count !== lastCount) {
+        lastHeight = height;
+        lastCount = count;
+        lastChange = Date.now();
+    }
+    var atBottom = window.scrollY + window.innerHeight >= height - 2;
+    if (Date.now() - started >= maxMs || (atBottom && Date.now() - lastChange >= stableMs)) {
+        done(count);
+        return;
+    }
+    if (!atBottom) {
+        window.scrollBy(0, window.innerHeight);
+    }
+    setTimeout(step, stepMs);
+}
+step();
+"""
+
+
+def build_css_selector(tag: str, attributes: Dict[str, str]) -> str:
+    """
+    Builds the CSS selector matching the same elements as a BeautifulSoup `find_all(tag, attributes)`.
+
+    Args:
+        tag: The tag name, e.g. "div".
+        attributes: The attributes to match. A space separated class value matches elements having all of these classes.
+
+    Returns:
+        The CSS selector, e.g. "div.productrow".
+    """
+    selector = tag
+    for name, value in attributes.items():
+        if name == "class":
+            selector += "".join(f".{class_name}" for class_name in value.split())
+        else:
+            selector += f'[{name}="{value}"]'
+    return selector
+
 
 class WebsiteScraper:
     """
     A class to scrape data from the website from fashion ecommerce websites.
-    get_all_product_info() method is the main method used to extract all
-    available product information into a specified product class into a list.
+    iter_product_pages() method is the main method used to extract the
+    product information of each page into a specified product class, one page
+    at a time. get_all_product_info() collects every page into a list.
     """
 
     def __init__(
@@ -34,6 +93,7 @@ class WebsiteScraper:
         product_class: type,
         button_xpath: str,
         button_script: str,
+        driver_pool: Optional[DriverPool] = None,
     ):
         self.base_url = base_url
         self.url_product_prefix = url_product_prefix
@@ -44,7 +104,10 @@ class WebsiteScraper:
         self.product_class = product_class
         self.button_xpath = button_xpath
         self.button_script = button_script
+        self.product_selector = build_css_selector(product_tag, product_tag_attribute)
+        self.driver_pool = driver_pool
         self._driver = None
+        self._pages_scraped = 0
         self._product_listing = None
 
     def get_all_product_info(self, max_pages: Optional[int] = 100) -> List[Product]:
@@ -56,32 +119,54 @@ class WebsiteScraper:
             A list of dictionaries, each containing
             extracted product information.
         """
+        return [product for page_products in self.iter_product_pages(max_pages) for product in page_products]
+
+    def iter_product_pages(self, max_pages: Optional[int] = 100) -> Iterator[List[Product]]:
+        """
+        Extracts the product information of the website page by page.
+
+        Each page's products are yielded as soon as the page is parsed, so
+        they can be loaded while the following pages are scraped. The driver
+        is quit when the last page is reached or the generator is closed.
+
+        Args:
+            max_pages: The maximum number of pages to scrape.
+
+        Yields:
+            The products of each page.
+        """
 
+        if max_pages is not None and max_pages <= 0:  # nothing to scrape, so no browser session is taken
+            return
         self._get_driver()
-        self._go_to_website()
-        self._click_button()
-        self._scroll_to_bottom()
-        prev_url = "previous_url"
-        pg = 1
-        all_products = []
-
-        while self._has_next_page(prev_url):
-            prev_url = self._driver.current_url
-            page_source = self._driver.page_source
-            page_products = self._get_products_from_page(page_source)
-            if (len(page_products) > 0) & (pg <= max_pages):
-                all_products.extend(page_products)
-
-                self._click_next_page()
-                pg += 1
-                self._click_button()
-                self._scroll_to_bottom()
-                print(self._driver.current_url, len(page_products))
-            else:
-                break
-
-        self._quit_driver()
-        return all_products
+        failed = False
+        try:
+            self._go_to_website()
+            self._click_button()
+            self._scroll_to_bottom()
+            prev_url = "previous_url"
+            pg = 1
+
+            while self._has_next_page(prev_url):
+                prev_url = self._driver.current_url
+                page_source = self._driver.page_source
+                page_products = self._get_products_from_page(page_source)
+                if (len(page_products) > 0) & (max_pages is None or pg <= max_pages):
+                    self._pages_scraped += 1
+                    yield page_products
+
+                    self._click_next_page()
+                    pg += 1
+                    self._click_button()
+                    self._scroll_to_bottom()
+                    print(self._driver.current_url, len(page_products))
+                else:
+                    break
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._quit_driver(failed=failed)
 
     def _has_next_page(self, prev_url: str) -> bool:
         current_url = self._driver.current_url
@@ -100,8 +185,10 @@ class WebsiteScraper:
         Returns:
             A list of dictionaries containing product information.
         """
-        now_datetime = datetime.now(pytz.timezone("Asia/Singapore"))
-        soup = BeautifulSoup(page_source, "html.parser")
+        now_datetime = datetime.now(pytz.timezone(SCRAPER_TIMEZONE))
+        # only build the tree under the product containers, the rest of the page is skipped while parsing
+        strainer = SoupStrainer(self.product_tag, self.product_tag_attribute)
+        soup = BeautifulSoup(page_source, HTML_PARSER, parse_only=strainer)
         product_listing = soup.find_all(self.product_tag, self.product_tag_attribute)
 
         if len(product_listing) > 0:
@@ -115,50 +202,98 @@ class WebsiteScraper:
 
     def _get_driver(self):
         """
-        Provides a headless Chrome driver for scraping.
+        Provides a driver for scraping, from the driver pool if one is given.
 
         Returns:
         """
-        print("                ###### _get_driver")
-        url = f"http://{WEBDRIVER_HOST}:{WEBDRIVER_PORT}"
-        # options = webdriver.ChromeOptions()
-        # options.add_argument('--no-sandbox')
-        # options.add_argument('--disable-dev-shm-usage')
-        # options.add_argument('--headless')
-        # options.add_argument('--disable-gpu')
-        # options.add_argument('--disable-extensions')
-        # options.add_argument('--remote-debugging-port=9222')
-        # options.add_argument('--log-level=DEBUG')
-        # options.add_argument('--enable-logging')
-        # options.add_argument('--disable-software-rasterizer')
-        # options.add_argument("--disable-notifications")
-        # options.add_argument("--disable-infobars")
-        options = webdriver.FirefoxOptions()
-        options.headless = False
-        self._driver = webdriver.Remote(url, options=options)
-        self._driver.get("http://google.com")
-        print("     testing:", self._driver.title, self._driver.current_url)
+        if self.driver_pool is not None:
+            self._driver = self.driver_pool.acquire()
+        else:
+            self._driver = create_remote_driver()
+        self._pages_scraped = 0
         return
 
     def _go_to_website(self):
         current_url = self.base_url + self.url_product_prefix
         self._driver.get(current_url)
+        self._wait_for_products()
 
-    def _quit_driver(self):
+    def _wait_for_products(self) -> bool:
         """
-        Quits a headless Chrome driver for scraping.
+        Waits until at least one product is present on the page.
 
         Returns:
+            True if a product appeared within SCRAPER_WAIT_TIMEOUT seconds.
         """
-        self._driver.quit()
+        try:
+            WebDriverWait(self._driver, SCRAPER_WAIT_TIMEOUT).until(
+                expected_conditions.presence_of_element_located((By.CSS_SELECTOR, self.product_selector))
+            )
+        except TimeoutException:
+            print(f"no products found with selector {self.product_selector} on {self._driver.current_url}.")
+            return False
+        return True
+
+    def _wait_for_page_change(self, prev_url: str, prev_products: List) -> bool:
+        """
+        Waits until the page navigated away, the previous products were replaced or the number of products changed,
+        then for the new products.
+
+        Args:
+            prev_url: The URL before the page changing action.
+            prev_products: The product elements from before the action.
+
+        Returns:
+            True if the page changed and products are present.
+        """
+
+        def page_changed(driver) -> bool:
+            if driver.current_url != prev_url:
+                return True
+            if len(driver.find_elements(By.CSS_SELECTOR, self.product_selector)) != len(prev_products):
+                return True
+            if not prev_products:
+                return False
+            try:
+                prev_products[0].is_enabled()
+                return False
+            except StaleElementReferenceException:
+                return True
+
+        try:
+            WebDriverWait(self._driver, SCRAPER_WAIT_TIMEOUT).until(page_changed)
+        except TimeoutException:
+            print(f"page did not change after {SCRAPER_WAIT_TIMEOUT}s on {prev_url}.")
+            return False
+        return self._wait_for_products()
+
+    def _find_products(self) -> List:
+        return self._driver.find_elements(By.CSS_SELECTOR, self.product_selector)
+
+    def _quit_driver(self, failed: bool = False):
+        """
+        Returns the driver to the driver pool, or quits it if there is no pool.
+
+        Args:
+            failed: Whether scraping raised an error, in which case a pooled driver is recycled.
+
+        Returns:
+        """
+        if self.driver_pool is not None:
+            self.driver_pool.release(self._driver, pages=self._pages_scraped, failed=failed)
+        else:
+            self._driver.quit()
+        self._driver = None
         return
 
     def _click_button(self):
         try:
             if len(self.button_xpath) > 0:
+                prev_url, prev_products = self._driver.current_url, self._find_products()
                 button_element = self._driver.find_element(By.XPATH, self.button_xpath)
                 self._driver.execute_script(self.button_script, button_element)
-                time.sleep(1)
+                # the products of the page are already present, so wait for the click to load or replace some
+                self._wait_for_page_change(prev_url, prev_products)
         except (NoSuchElementException, JavascriptException) as e:
             print(f"cannot find button due to {type(e).__name__} from xpath: {self.button_xpath}.")
             return False
@@ -175,28 +310,27 @@ class WebsiteScraper:
         """
         try:
             self._close_window_handles()
+            prev_url, prev_products = self._driver.current_url, self._find_products()
             next_page_element = self._driver.find_element(By.XPATH, self.next_page_xpath)
             self._driver.execute_script(self.next_page_script, next_page_element)
-            time.sleep(0.5)
+            self._wait_for_page_change(prev_url, prev_products)
         except (NoSuchElementException, JavascriptException) as e:
             print(f"cannot find next page button due to {type(e).__name__} from xpath: {self.next_page_xpath}.")
 
     def _scroll_to_bottom(self):
         """
-        Scrolls to the bottom of webpage
+        Scrolls to the bottom of webpage until lazy loaded products stop appearing.
+
+        The scrolling runs in the page as one asynchronous script, which
+        returns once the page height and product count are stable for
+        SCRAPER_SCROLL_STABLE_MS at the bottom of the page, or after
+        SCRAPER_WAIT_TIMEOUT seconds.
         """
         try:
-            height_script = "return document.body.scrollHeight"
-            height = self._driver.execute_script(height_script)
-            if height is None:
-                height = 26888
-            total_height = int(height)
-            for i in range(1, total_height, 30):
-                scroll_script = f"window.scrollTo(0, {i});"
-                self._driver.execute_script(scroll_script)
-            time.sleep(0.5)
-
-        except (NoSuchElementException, JavascriptException) as e:
+            self._driver.execute_async_script(
+                SCROLL_UNTIL_STABLE_SCRIPT, self.product_selector, SCRAPER_SCROLL_STABLE_MS, int(SCRAPER_WAIT_TIMEOUT * 1000), 50
+            )
+        except WebDriverException as e:  # any driver error, script timeouts included, only ends the scroll
             print(f"cannot scroll to bottom of page due to {type(e).__name__}.")
 
     def _close_window_handles(self):
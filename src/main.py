@@ -1,11 +1,39 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 
 from src.config import APP_HOST, APP_PORT
 
+from .app.jobs import JobManager
 from .app.routes import router
+from .app.utils import (
+    close_database,
+    initialise_database,
+    initialise_embedding_batchers,
+    initialise_search_result_cache,
+)
+from .etl.driver_pool import DriverPool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.databases = initialise_database()
+    _, vector_db = app.state.databases
+    app.state.embedding_batchers = initialise_embedding_batchers(vector_db)
+    app.state.search_result_cache = initialise_search_result_cache()
+    app.state.job_manager = JobManager()
+    app.state.driver_pool = DriverPool()
+    yield
+    # the running ETL job stops after its current items and must end before the databases close
+    app.state.job_manager.shutdown()
+    app.state.driver_pool.close()
+    for batcher in app.state.embedding_batchers.values():
+        await batcher.stop()
+    close_database(*app.state.databases)
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.include_router(router)
 
 
@@ -1,41 +1,122 @@
+import time
+
+import pytest
 from fastapi.testclient import TestClient
 
 from src.main import app
 
-client = TestClient(app)
 
+@pytest.fixture(scope="module")
+def client():
+    # entering the client runs the application lifespan, which opens the shared databases
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def wait_for_job(client, job_id, timeout=900):
+    # jobs run one at a time, so a test waiting for its own job also waits for those queued before it
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] not in {"queued", "running"} or time.monotonic() > deadline:
+            return job
+        time.sleep(1)
 
-def test_update_db_success():
+
+def test_update_db_success(client):
     response = client.post("/update/1")
-    assert response.status_code == 200
+    assert response.status_code == 202
     assert "ETL pipeline trigger successful. " in response.json()["message"]
+    assert "job_id" in response.json()
+    assert wait_for_job(client, response.json()["job_id"])["status"] == "succeeded"
 
 
-def test_update_db_fail():
+def test_update_db_fail(client):
     response = client.post("/update/i")
     assert response.status_code == 422
 
 
-def test_search_data_text_success():
+def test_get_job_success(client):
+    job_id = client.post("/update/0").json()["job_id"]
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] in {"queued", "running", "succeeded", "failed"}
+    assert wait_for_job(client, job_id)["status"] == "succeeded"
+
+
+def test_get_job_fail(client):
+    response = client.get("/jobs/unknown")
+    assert response.status_code == 404
+
+
+def test_search_data_text_success(client):
     body = {"text": "sleeveless pink A-line maxi dress", "type": "text"}
     response = client.post("/search", json=body)
     assert response.status_code == 200
     assert len(response.json()) == 10
 
 
-def test_search_data_image_success():
+def test_search_data_image_success(client):
     body = {"text": "./data/images/(BACKORDER)_ATHENA_EYELET_FLUTTER_SLEEVE_DRESS_NAVY_.jpg", "type": "image"}
     response = client.post("/search", json=body)
     assert response.status_code == 200
     assert len(response.json()) == 10
 
 
-def test_search_data_image_fail():
+def test_search_data_product_name_success(client):
+    body = {"text": "athena eyelet flutter sleeve dress", "type": "text"}
+    response = client.post("/search", json=body)
+    assert response.status_code == 200
+    assert "athena" in response.json()[0]["title"].lower()
+
+
+def test_search_data_brand_filter_success(client):
+    body = {"text": "sleeveless pink A-line maxi dress", "type": "text", "brand": "Love Bonito"}
+    response = client.post("/search", json=body)
+    assert response.status_code == 200
+    assert len(response.json()) == 10
+    assert {result["brand"] for result in response.json()} == {"Love Bonito"}
+
+
+def test_search_data_image_fail(client):
     body = {"text": "./test/(BACKORDER)_ATHENA_EYELET_FLUTTER_SLEEVE_DRESS_NAVY_.jpg", "type": "image"}
     response = client.post("/search", json=body)
     assert response.status_code == 400
     assert response.json() == {"error": "Image path invalid"}
 
 
+def test_search_data_image_not_an_image_fail(client):
+    body = {"text": "manifest.json", "type": "image"}
+    response = client.post("/search", json=body)
+    assert response.status_code == 400
+    assert response.json() == {"error": "Image path invalid"}
+
+
+def test_search_data_batch_success(client):
+    body = [
+        {"text": "sleeveless pink A-line maxi dress", "type": "text"},
+        {"text": "./data/images/(BACKORDER)_ATHENA_EYELET_FLUTTER_SLEEVE_DRESS_NAVY_.jpg", "type": "image"},
+        {"text": "linen shirt", "type": "text"},
+    ]
+    response = client.post("/search/batch", json=body)
+    assert response.status_code == 200
+    assert [len(results) for results in response.json()] == [10, 10, 10]
+
+
+def test_search_data_batch_fail(client):
+    body = [
+        {"text": "linen shirt", "type": "text"},
+        {"text": "./test/(BACKORDER)_ATHENA_EYELET_FLUTTER_SLEEVE_DRESS_NAVY_.jpg", "type": "image"},
+    ]
+    response = client.post("/search/batch", json=body)
+    assert response.status_code == 400
+
+
+def test_stats_success(client):
+    response = client.get("/stats")
+    assert response.status_code == 200
+    assert {"hits", "misses"} <= response.json()["query_embedding_cache"].keys()
+
+
 if __name__ == "__main__":
     print(__package__)
@@ -0,0 +1,43 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+from src.database.backfill_metadata import backfill_metadata
+from src.database.vector_models import to_epoch_seconds
+
+
+class FakeStoredVectors:
+    def __init__(self, metadatas):
+        self.metadatas = metadatas
+        self.persisted = False
+
+    def get_all_data(self):
+        return {"ids": list(self.metadatas), "metadatas": list(self.metadatas.values())}
+
+    def update_metadata(self, items):
+        for item in items:
+            self.metadatas[str(item.id)] = {"title": item.id, "brand": item.brand, "scraped_time": to_epoch_seconds(item.scraped_time)}
+
+    def persist(self):
+        self.persisted = True
+
+
+class FakeItemsByIds:
+    def __init__(self, items):
+        self.items = {item.id: item for item in items}
+        self.requests = []
+
+    def read_item_by_ids(self, ids):
+        self.requests.append(ids)
+        return [self.items[item_id] for item_id in ids if item_id in self.items]
+
+
+def test_backfill_metadata_updates_only_vectors_missing_filter_keys():
+    scraped_time = datetime(2024, 5, 1, 12, 0)
+    items = [SimpleNamespace(id=i, brand="Love Bonito", scraped_time=scraped_time) for i in range(1, 6)]
+    complete = {"title": 5, "brand": "Love Bonito", "scraped_time": to_epoch_seconds(scraped_time)}
+    vector_db = FakeStoredVectors({"1": {"title": 1}, "2": {"title": 2}, "3": None, "4": {"title": 4, "brand": "Love Bonito"}, "5": complete})
+    item_db = FakeItemsByIds(items)
+    assert backfill_metadata(item_db, vector_db, batch_size=2) == 4
+    assert item_db.requests == [[1, 2], [3, 4]]
+    assert all(metadata == {**complete, "title": int(vector_id)} for vector_id, metadata in vector_db.metadatas.items())
+    assert vector_db.persisted
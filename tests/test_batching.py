@@ -0,0 +1,33 @@
+import asyncio
+
+from src.app.batching import MicroBatcher
+
+
+def run_batcher(process_batch, items, max_batch_size=8):
+    async def main():
+        batcher = MicroBatcher(process_batch, max_batch_size=max_batch_size, max_wait_ms=20)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(item) for item in items), return_exceptions=True), batcher.stats()
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+def test_micro_batcher_groups_concurrent_items():
+    results, stats = run_batcher(lambda batch: [2 * x for x in batch], list(range(20)))
+    assert results == [2 * x for x in range(20)]
+    assert stats["batches"] < 20
+    assert all(int(size) <= 8 for size in stats["batch_sizes"])
+
+
+def test_micro_batcher_fails_only_the_bad_item():
+    def process_batch(batch):
+        if "bad" in batch:
+            raise ValueError("cannot embed")
+        return [item.upper() for item in batch]
+
+    results, _ = run_batcher(process_batch, ["a", "bad", "c"])
+    assert results[0] == "A" and results[2] == "C"
+    assert isinstance(results[1], ValueError)
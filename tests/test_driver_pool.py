@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from src.etl.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.quit_called = False
+        self.broken = False
+        self.window_handles = ["main"]
+        self.switch_to = self
+
+    @property
+    def current_url(self):
+        if self.broken:
+            raise WebDriverException("session deleted")
+        return "about:blank"
+
+    def window(self, handle):
+        pass
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_driver_pool_reuses_healthy_sessions():
+    pool = DriverPool(max_size=1, max_pages=10, create_driver=FakeDriver)
+    driver = pool.acquire()
+    pool.release(driver, pages=3)
+    assert pool.acquire() is driver
+    assert pool.stats()["created"] == 1 and pool.stats()["reused"] == 1
+
+
+def test_driver_pool_recycles_worn_out_failed_and_broken_sessions():
+    pool = DriverPool(max_size=1, max_pages=5, create_driver=FakeDriver)
+    driver = pool.acquire()
+    pool.release(driver, pages=5)  # reached max_pages
+    assert driver.quit_called
+    driver = pool.acquire()
+    pool.release(driver, failed=True)
+    assert driver.quit_called
+    driver = pool.acquire()
+    pool.release(driver)
+    driver.broken = True  # dropped by the grid while idle
+    assert pool.acquire() is not driver
+    assert driver.quit_called
+    assert pool.stats()["created"] == 4 and pool.stats()["recycled"] == 3
+
+
+def test_driver_pool_recycles_idle_sessions():
+    pool = DriverPool(max_size=1, idle_timeout=0, create_driver=FakeDriver)
+    driver = pool.acquire()
+    pool.release(driver)
+    time.sleep(0.01)
+    assert pool.acquire() is not driver
+
+
+def test_driver_pool_waits_for_a_free_session():
+    pool = DriverPool(max_size=1, create_driver=FakeDriver)
+    driver = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    threading.Timer(0.05, pool.release, args=(driver,)).start()
+    assert pool.acquire(timeout=5) is driver
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,43 @@
+import threading
+
+from src.etl import extract
+
+
+def test_iter_scraped_pages_yields_pages_of_every_website(monkeypatch):
+    def fake_pages(config, pages, driver_pool):
+        for page in range(pages):
+            yield [f"{config['name']}-{page}"]
+
+    monkeypatch.setattr(extract, "iter_product_pages_from_website", fake_pages)
+    configs = {"a": {"name": "a"}, "b": {"name": "b"}}
+    scraped = list(extract.iter_scraped_pages(configs, pages=3, maxsize=1))
+    assert sorted(products[0] for _, products in scraped) == sorted(f"{name}-{page}" for name in configs for page in range(3))
+
+
+def test_iter_scraped_pages_skips_failing_website(monkeypatch):
+    def fake_pages(config, pages, driver_pool):
+        yield ["first"]
+        if config["fail"]:
+            raise RuntimeError("website is down")
+        yield ["second"]
+
+    monkeypatch.setattr(extract, "iter_product_pages_from_website", fake_pages)
+    scraped = list(extract.iter_scraped_pages({"bad": {"fail": True}, "good": {"fail": False}}, pages=2))
+    assert sorted((name, products[0]) for name, products in scraped) == [("bad", "first"), ("good", "first"), ("good", "second")]
+
+
+def test_iter_scraped_pages_stops_scrapers_when_closed(monkeypatch):
+    closed = threading.Event()
+
+    def endless_pages(config, pages, driver_pool):
+        try:
+            while True:
+                yield ["product"]
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(extract, "iter_product_pages_from_website", endless_pages)
+    pages = extract.iter_scraped_pages({"a": {}}, pages=None, maxsize=1)
+    assert next(pages) == ("a", ["product"])
+    pages.close()  # waits for the scraper thread to finish
+    assert closed.is_set()
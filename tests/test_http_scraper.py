@@ -0,0 +1,66 @@
+from src.etl.http_scraper import HttpWebsiteScraper
+from src.etl.product import TWLProduct
+
+LISTING_PAGE = """
+<html><body>
+<div class="header">Products</div>
+{products}
+<ul class="pager">{pager}</ul>
+</body></html>
+"""
+PRODUCT = '<div class="productrow"><div class="product-title">\n<a href="/products/{name}">{name}</a></div><img class="img-responsive" src="{name}.jpg"></div>'
+
+
+class FakeResponse:
+    def __init__(self, url, text):
+        self.url = url
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+def create_http_scraper(pages):
+    scraper = HttpWebsiteScraper(
+        base_url="https://shop.test",
+        url_product_prefix="/products",
+        product_tag="div",
+        product_tag_attribute={"class": "productrow"},
+        next_page_xpath="//ul[@class='pager']//a[@class='next']",
+        next_page_script="",
+        product_class=TWLProduct,
+        button_xpath="",
+        button_script="",
+    )
+    fetched = []
+
+    def get(url, timeout):
+        fetched.append(url)
+        page = 1 if url.endswith("/products") else int(url.rsplit("=", 1)[1])
+        pager = f'<li><a class="next" href="/products?page={page + 1}">next</a></li>' if page < pages else ""
+        products = "".join(PRODUCT.format(name=f"p{page}-{i}") for i in range(2))
+        return FakeResponse(url, LISTING_PAGE.format(products=products, pager=pager))
+
+    scraper.session.get = get
+    return scraper, fetched
+
+
+def test_http_scraper_follows_pager_up_to_max_pages():
+    scraper, fetched = create_http_scraper(pages=5)
+    pages = list(scraper.iter_product_pages(max_pages=3))
+    assert [[product.title for product in products] for products in pages] == [[f"p{page}-0", f"p{page}-1"] for page in (1, 2, 3)]
+    assert pages[1][0].url == "https://shop.test/products/p2-0"
+    assert pages[1][0].imgUrl == "p2-0.jpg"
+    assert fetched == ["https://shop.test/products", "https://shop.test/products?page=2", "https://shop.test/products?page=3"]
+
+
+def test_http_scraper_stops_on_last_page():
+    scraper, fetched = create_http_scraper(pages=2)
+    assert len(list(scraper.iter_product_pages(max_pages=10))) == 2
+    assert len(fetched) == 2
+
+
+def test_http_scraper_fetches_nothing_for_zero_pages():
+    scraper, fetched = create_http_scraper(pages=2)
+    assert list(scraper.iter_product_pages(max_pages=0)) == []
+    assert fetched == []
@@ -0,0 +1,24 @@
+import os
+import stat
+
+from src.etl.image_store import FILE_MODE, ImageStore
+
+
+def test_image_store_files_are_readable_by_other_users(tmp_path):
+    store = ImageStore(root=str(tmp_path))
+    path = store.put("https://shop.test/a.jpg", b"image bytes", etag='"v1"')
+    store.save()
+    assert stat.S_IMODE(os.stat(path).st_mode) == FILE_MODE
+    assert stat.S_IMODE(os.stat(store.manifest_path).st_mode) == FILE_MODE
+    assert ImageStore(root=str(tmp_path)).conditional_headers("https://shop.test/a.jpg") == {"If-None-Match": '"v1"'}
+
+
+def test_image_store_saves_manifest_only_when_changed(tmp_path):
+    store = ImageStore(root=str(tmp_path))
+    for i in range(3):  # pages of a run
+        store.put(f"https://shop.test/{i}.jpg", f"image {i}".encode())
+    assert not os.path.exists(store.manifest_path)
+    store.save()
+    os.remove(store.manifest_path)
+    store.save()  # nothing changed since the last save
+    assert not os.path.exists(store.manifest_path)
@@ -0,0 +1,30 @@
+import threading
+
+from src.app.jobs import Job
+
+
+def test_job_tracks_concurrent_stages():
+    job = Job()
+    entered = threading.Barrier(3)
+    release = threading.Event()
+
+    def run_stage(name):
+        with job.track_stage(name):
+            entered.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=run_stage, args=(name,)) for name in ("download_images", "download_images")]
+    for thread in threads:
+        thread.start()
+    with job.track_stage("load_sql"):
+        entered.wait()
+        assert job.to_dict()["active_stages"] == {"download_images": 2, "load_sql": 1}
+    assert job.to_dict()["active_stages"] == {"download_images": 2}
+    assert job.stages["download_images"]["finished_at"] is None
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    summary = job.to_dict()
+    assert summary["active_stages"] == {}
+    assert all(timing["seconds"] is not None for timing in summary["stages"].values())
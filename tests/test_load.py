@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from src.etl.load import insert_items_into_vectordb
+
+
+class FakeItemDB:
+    def __init__(self, items):
+        self.items = items
+        self.marked = []
+        self.failed = []
+
+    def iter_items_pending_vectordb(self, batch_size):
+        yield self.items
+
+    def mark_items_in_vectordb(self, ids):
+        self.marked.extend(ids)
+
+    def record_vectordb_failures(self, ids):
+        self.failed.extend(ids)
+
+
+class FakeVectorDB:
+    def __init__(self, stored_uris, bad_paths=()):
+        self.stored_uris = stored_uris
+        self.bad_paths = set(bad_paths)
+        self.inserted = []
+
+    def get_stored_uris(self, ids):
+        return {item_id: self.stored_uris[item_id] for item_id in ids if item_id in self.stored_uris}
+
+    def insert_data(self, items):
+        if any(item.filepath in self.bad_paths for item in items):
+            raise OSError("cannot identify image file")
+        self.inserted.extend(item.id for item in items)
+
+
+def test_insert_items_into_vectordb_records_failed_embeddings():
+    items = [SimpleNamespace(id=i, filepath=f"{i}.jpg") for i in range(1, 5)]
+    item_db = FakeItemDB(items)
+    vector_db = FakeVectorDB({}, bad_paths=["2.jpg"])
+    assert insert_items_into_vectordb(item_db, vector_db) == 3
+    assert vector_db.inserted == [1, 3, 4]  # the batch is retried item by item around the unreadable image
+    assert item_db.marked == [1, 3, 4]
+    assert item_db.failed == [2]
+
+
+def test_insert_items_into_vectordb_embeds_new_and_changed_images_only():
+    items = [SimpleNamespace(id=i, filepath=f"{i}.jpg") for i in range(1, 4)]
+    item_db = FakeItemDB(items)
+    vector_db = FakeVectorDB({"1": "1.jpg", "2": "2-old.jpg"})
+    assert insert_items_into_vectordb(item_db, vector_db) == 2
+    assert vector_db.inserted == [2, 3]  # 1 is stored with the same image
+    assert sorted(item_db.marked) == [1, 2, 3]
+    assert item_db.failed == []
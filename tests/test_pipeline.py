@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from src.etl.pipeline import run_pipeline
+
+
+def test_run_pipeline_passes_items_through_stages_in_order():
+    results = []
+    run_pipeline(range(20), [("double", lambda x: 2 * x), ("collect", results.append)], maxsize=2)
+    assert results == [2 * x for x in range(20)]
+
+
+def test_run_pipeline_raises_first_error_and_closes_source():
+    processed = []
+    closed = threading.Event()
+
+    def source():
+        try:
+            for i in range(1000):
+                yield i
+        finally:
+            closed.set()
+
+    def fail_on_three(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    with pytest.raises(ValueError, match="bad item"):
+        run_pipeline(source(), [("check", fail_on_three), ("collect", processed.append)], maxsize=1)
+    assert closed.is_set()
+    assert 3 not in processed
+    assert len(processed) < 1000  # the rest of the source was not read
+
+
+def test_run_pipeline_stops_without_error():
+    stop = threading.Event()
+    processed = []
+
+    def process(x):
+        processed.append(x)
+        if x == 5:
+            stop.set()
+        return x
+
+    run_pipeline(range(1000), [("process", process)], maxsize=1, stop=stop)
+    assert 5 in processed
+    assert len(processed) < 1000
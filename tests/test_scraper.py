@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+from selenium.common.exceptions import (
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+from selenium.webdriver.common.by import By
+
+from src.etl.product import TWLProduct
+from src.etl.scraper import WebsiteScraper
+
+
+class FakeElement:
+    def __init__(self):
+        self.stale = False
+
+    def is_enabled(self):
+        if self.stale:
+            raise StaleElementReferenceException("element is not attached to the page document")
+        return True
+
+
+class FakeBrowser:
+    def __init__(self, on_click):
+        self.current_url = "https://shop.test/products"
+        self.products = [FakeElement()]
+        self.on_click = on_click
+        self.clicks = 0
+        self.scroll_error = TimeoutException("script timeout")
+
+    def find_elements(self, by, value):
+        return list(self.products)
+
+    def find_element(self, by, value):
+        if by == By.CSS_SELECTOR and not self.products:
+            raise WebDriverException("no such element")
+        return FakeElement()
+
+    def execute_script(self, script, element):
+        self.clicks += 1
+        self.on_click(self)
+
+    def execute_async_script(self, *args):
+        raise self.scroll_error
+
+
+def create_selenium_scraper(browser):
+    scraper = WebsiteScraper(
+        base_url="https://shop.test",
+        url_product_prefix="/products",
+        product_tag="div",
+        product_tag_attribute={"class": "productrow"},
+        next_page_xpath="//a[@class='next']",
+        next_page_script="arguments[0].click();",
+        product_class=TWLProduct,
+        button_xpath="//button[@class='load-more']",
+        button_script="arguments[0].click();",
+    )
+    scraper._driver = browser
+    return scraper
+
+
+def test_click_button_waits_for_more_products():
+    def load_more_later(browser):
+        threading.Timer(0.2, browser.products.append, args=(FakeElement(),)).start()
+
+    browser = FakeBrowser(load_more_later)
+    scraper = create_selenium_scraper(browser)
+    started = time.monotonic()
+    assert scraper._click_button()
+    assert len(browser.products) == 2
+    assert time.monotonic() - started < 5
+
+
+def test_wait_for_page_change_sees_replaced_products():
+    def replace_products(browser):
+        browser.products[0].stale = True
+        browser.products = [FakeElement()]
+
+    browser = FakeBrowser(replace_products)
+    scraper = create_selenium_scraper(browser)
+    prev_products = scraper._find_products()
+    browser.execute_script("", None)
+    assert scraper._wait_for_page_change(browser.current_url, prev_products)
+
+
+@pytest.mark.parametrize("error", [TimeoutException("script timeout"), WebDriverException("javascript error: document unloaded")])
+def test_scroll_to_bottom_survives_driver_errors(error):
+    browser = FakeBrowser(lambda browser: None)
+    browser.scroll_error = error
+    create_selenium_scraper(browser)._scroll_to_bottom()
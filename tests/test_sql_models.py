@@ -0,0 +1,53 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytz
+
+from src.config import SCRAPER_TIMEZONE
+from src.database.sql_models import ItemDB
+from src.database.vector_models import build_item_metadata
+from src.etl.load import insert_items_into_sql
+
+# these tests need the PostgreSQL database of the app
+
+
+@pytest.fixture(scope="module")
+def item_db():
+    item_db = ItemDB()
+    yield item_db
+    item_db.close()
+
+
+@pytest.fixture
+def scraped_item(item_db):
+    # scraped the way the scraper records it: an aware SCRAPER_TIMEZONE time
+    processed_time = datetime.now(pytz.timezone(SCRAPER_TIMEZONE)).replace(microsecond=0)
+    product = SimpleNamespace(
+        title=f"round trip dress {uuid.uuid4().hex}",
+        brand="Round Trip Test",
+        url="https://shop.test/round-trip-dress",
+        imgName="round-trip-test.jpg",
+        processed_time=processed_time,
+    )
+    insert_items_into_sql(item_db, [product])
+    (item,) = item_db.filter_items_by_charfields({"title": product.title})
+    yield item, processed_time
+    item_db.delete_item(item.id)
+
+
+def test_scraped_time_round_trips_through_the_database(scraped_item):
+    item, processed_time = scraped_item
+    assert item.scraped_time == processed_time
+    assert build_item_metadata(item)["scraped_time"] == int(processed_time.timestamp())
+
+
+def test_title_search_filters_on_scraper_wall_time(item_db, scraped_item):
+    item, processed_time = scraped_item
+    # the API receives naive filter times, read in SCRAPER_TIMEZONE like the vector filters
+    wall_time = processed_time.replace(tzinfo=None)
+    matches = item_db.search_titles(item.title, brand=item.brand, scraped_after=wall_time, scraped_before=wall_time)
+    assert [item_id for item_id, _ in matches] == [item.id]
+    assert item_db.search_titles(item.title, brand=item.brand, scraped_after=wall_time + timedelta(minutes=1)) == []
+    assert item_db.search_titles(item.title, brand=item.brand, scraped_before=wall_time - timedelta(minutes=1)) == []
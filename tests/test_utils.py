@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.app import utils
+from src.app.utils import (
+    UnsearchableQueriesError,
+    fuse_rankings,
+    initialise_search_result_cache,
+    reciprocal_rank_fusion,
+    search_images,
+    search_images_batch,
+)
+
+
+def test_reciprocal_rank_fusion_favours_items_in_both_rankings():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4]], k=60)
+    assert [item_id for item_id, _ in fused] == [3, 1, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_fuse_rankings_keeps_distances_of_vector_results():
+    ids, distances, scores = fuse_rankings(["1", "2"], [0.1, 0.2], [3, 2], n=2)
+    assert ids == ["2", "1"]
+    assert distances == [0.2, 0.1]
+    assert scores[0] > scores[1]
+    ids, distances, _ = fuse_rankings(["1"], [0.1], [3], n=2)
+    assert set(ids) == {"1", "3"}
+    assert distances[ids.index("3")] is None
+
+
+class FakeQueryEmbedder:
+    def embed_texts(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_images(self, paths):
+        if any(path.startswith("bad") for path in paths):
+            raise OSError("cannot identify image file")
+        return [[0.0, 1.0] for _ in paths]
+
+
+def test_search_images_batch_names_every_query_that_cannot_be_embedded():
+    queries = [("image", "good.jpg", None), ("image", "bad-1.jpg", None), ("text", "red dress", None), ("image", "bad-2.jpg", None)]
+    with pytest.raises(UnsearchableQueriesError) as error:
+        search_images_batch(None, FakeQueryEmbedder(), queries)
+    assert error.value.positions == [1, 3]
+
+
+class FakeBatcher:
+    def __init__(self):
+        self.submitted = []
+
+    async def submit(self, query):
+        self.submitted.append(query)
+        return [1.0, 0.0]
+
+
+def test_search_result_caches_are_not_shared_between_vector_dbs(monkeypatch):
+    monkeypatch.setattr(utils, "search_images_by_text_embedding", lambda *args: [])
+    batcher = FakeBatcher()
+
+    def search(vector_db, cache):
+        return asyncio.run(search_images(None, vector_db, {"text": batcher}, cache, "text", "red dress"))
+
+    first_db, first_cache = SimpleNamespace(version=0), initialise_search_result_cache()
+    search(first_db, first_cache)
+    search(first_db, first_cache)
+    assert len(batcher.submitted) == 1
+    search(SimpleNamespace(version=0), initialise_search_result_cache())  # e.g. an application started again
+    assert len(batcher.submitted) == 2
@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+
+from src.database.vector_stores import (
+    ExactVectorStore,
+    HnswVectorStore,
+    QuantizedVectorStore,
+    _MetadataColumns,
+    _Snapshot,
+    column_mask,
+    matches_where,
+    top_k_similarities,
+)
+
+
+@pytest.mark.parametrize("store_class", [ExactVectorStore, QuantizedVectorStore, HnswVectorStore])
+def test_local_vector_store_replaces_embedding_of_stored_id(tmp_path, store_class):
+    embeddings = np.eye(8, dtype=np.float32)
+    store = store_class(path=str(tmp_path))
+    store.add([str(i) for i in range(4)], embeddings[:4].tolist(), [{"brand": "a"}] * 4, [f"{i}.jpg" for i in range(4)])
+    store.add(["1"], [embeddings[6].tolist()], [{"brand": "b"}], ["1-new.jpg"])  # the image of item 1 changed
+    store.persist()
+
+    for opened in (store, store_class(path=str(tmp_path))):
+        assert opened.count() == 4
+        assert sorted(opened.get_all()["ids"]) == ["0", "1", "2", "3"]
+        assert opened.get_uris(["1"]) == {"1": "1-new.jpg"}
+        result = opened.query([embeddings[6].tolist()], n=4)
+        assert result["ids"][0][0] == "1"
+        assert result["ids"][0].count("1") == 1
+        assert sorted(opened.query([embeddings[1].tolist()], n=4, where={"brand": "a"})["ids"][0]) == ["0", "2", "3"]
+
+
+@pytest.mark.parametrize("store_class", [ExactVectorStore, QuantizedVectorStore, HnswVectorStore])
+def test_local_vector_store_reopens(tmp_path, store_class):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((50, 16)).astype(np.float32)
+    store = store_class(path=str(tmp_path))
+    for start in range(0, 50, 8):  # batches like the ETL's
+        end = min(start + 8, 50)
+        store.add(
+            [str(i) for i in range(start, end)],
+            embeddings[start:end].tolist(),
+            [{"title": i} for i in range(start, end)],
+            [f"{i}.jpg" for i in range(start, end)],
+        )
+    store.persist()
+
+    reopened = store_class(path=str(tmp_path))
+    assert reopened.count() == 50
+    assert reopened.get_uris(["3", "99"]) == {"3": "3.jpg"}
+    result = reopened.query([embeddings[7].tolist()], n=3)
+    assert result["ids"][0][0] == "7"
+    assert len(result["distances"][0]) == 3
+
+
+def test_top_k_similarities_matches_full_sort_across_chunks():
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((100, 8)).astype(np.float32)
+    queries = rng.standard_normal((3, 8)).astype(np.float32)
+    rows, scores = top_k_similarities(matrix, queries, k=5, chunk_size=16)
+    expected = np.argsort(-(queries @ matrix.T), axis=1)[:, :5]
+    np.testing.assert_array_equal(rows, expected)
+    np.testing.assert_allclose(scores, np.take_along_axis(queries @ matrix.T, expected, axis=1), rtol=1e-5)
+
+
+def test_top_k_similarities_skips_masked_rows():
+    matrix = np.eye(4, dtype=np.float32)
+    mask = np.array([True, False, True, True])
+    rows, _ = top_k_similarities(matrix, matrix[1:2], k=3, chunk_size=2, mask=mask)
+    assert 1 not in rows[0]
+
+
+def test_quantized_store_reranks_candidates_exactly(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((200, 16)).astype(np.float32)
+    queries = rng.standard_normal((2, 16)).astype(np.float32)
+    quantized = QuantizedVectorStore(path=str(tmp_path / "int8"), scale_fit_rows=64)
+    exact = ExactVectorStore(path=str(tmp_path / "exact"))
+    for store in (quantized, exact):
+        store.add([str(i) for i in range(200)], embeddings.tolist(), [{}] * 200, [f"{i}.jpg" for i in range(200)])
+    result = quantized.query(queries.tolist(), n=5)
+    expected = exact.query(queries.tolist(), n=5)
+    assert result["ids"] == expected["ids"]
+    np.testing.assert_allclose(result["distances"], expected["distances"], rtol=1e-5, atol=1e-6)
+
+
+@pytest.mark.parametrize("store_class", [ExactVectorStore, QuantizedVectorStore, HnswVectorStore])
+def test_local_vector_store_updates_metadata(tmp_path, store_class):
+    embeddings = np.eye(8, dtype=np.float32)
+    store = store_class(path=str(tmp_path))
+    store.add([str(i) for i in range(4)], embeddings[:4].tolist(), [{"title": i} for i in range(4)], [f"{i}.jpg" for i in range(4)])
+    store.persist()
+    assert store.query([embeddings[0].tolist()], n=4, where={"brand": "a"})["ids"] == [[]]
+    store.update_metadata(["0", "2", "99"], [{"title": 0, "brand": "a"}, {"title": 2, "brand": "a"}, {"brand": "a"}])
+    store.persist()
+
+    for opened in (store, store_class(path=str(tmp_path))):
+        assert sorted(opened.query([embeddings[0].tolist()], n=4, where={"brand": "a"})["ids"][0]) == ["0", "2"]
+        assert opened.count() == 4
+
+
+def test_matches_where():
+    metadata = {"brand": "Love Bonito", "scraped_time": 1700000000}
+    assert matches_where(metadata, {"brand": "Love Bonito"})
+    assert not matches_where(metadata, {"brand": {"$ne": "Love Bonito"}})
+    assert matches_where(metadata, {"$and": [{"brand": {"$in": ["Love Bonito"]}}, {"scraped_time": {"$gte": 1700000000}}]})
+    assert not matches_where(metadata, {"$and": [{"brand": "Love Bonito"}, {"scraped_time": {"$lt": 1700000000}}]})
+    assert matches_where(metadata, {"$or": [{"brand": "The Willow Label"}, {"scraped_time": {"$gt": 0}}]})
+    assert not matches_where({}, {"scraped_time": {"$gt": 0}})  # missing values never compare
+
+
+def test_column_mask_agrees_with_matches_where():
+    metadatas = [{"brand": "a", "scraped_time": 10}, {"brand": "b", "scraped_time": 20}, {"brand": "a"}, {"scraped_time": 30}, {}]
+    columns = _MetadataColumns()
+    columns.append(metadatas)
+    wheres = [
+        {"brand": "a"},
+        {"brand": {"$ne": "a"}},
+        {"brand": {"$in": ["a", "c"]}},
+        {"brand": {"$nin": ["a"]}},
+        {"scraped_time": {"$gte": 20}},
+        {"scraped_time": {"$lt": 20}},
+        {"scraped_time": {"$ne": 20}},
+        {"$and": [{"brand": "a"}, {"scraped_time": {"$gte": 10}}, {"scraped_time": {"$lte": 10}}]},
+        {"$or": [{"brand": "b"}, {"scraped_time": {"$gt": 25}}]},
+    ]
+    for where in wheres:
+        expected = [matches_where(metadata, where) for metadata in metadatas]
+        assert column_mask(columns.view(len(metadatas)), where, len(metadatas)).tolist() == expected, where
+    # left to matches_where: keys without a column and ordering of strings
+    assert column_mask(columns.view(len(metadatas)), {"title": 1}, len(metadatas)) is None
+    assert column_mask(columns.view(len(metadatas)), {"brand": {"$gt": "a"}}, len(metadatas)) is None
+
+
+def test_snapshot_caches_a_bounded_number_of_masks():
+    metadatas = [{"brand": str(i % 3), "scraped_time": i} for i in range(10)]
+    columns = _MetadataColumns()
+    columns.append(metadatas)
+    snapshot = _Snapshot([str(i) for i in range(10)], metadatas, 10, columns=columns.view(10))
+    for threshold in range(2 * _Snapshot.MASK_CACHE_SIZE):
+        assert snapshot.mask({"scraped_time": {"$gte": threshold}}).sum() == max(10 - threshold, 0)
+    assert len(snapshot._masks) == _Snapshot.MASK_CACHE_SIZE
+
+
+@pytest.mark.parametrize("store_class", [ExactVectorStore, QuantizedVectorStore, HnswVectorStore])
+def test_local_vector_store_filters_after_reopening(tmp_path, store_class):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((50, 16)).astype(np.float32)
+    metadatas = [{"brand": "a" if i % 2 else "b", "scraped_time": 1700000000 + i} for i in range(50)]
+    store = store_class(path=str(tmp_path))
+    store.add([str(i) for i in range(50)], embeddings.tolist(), metadatas, [f"{i}.jpg" for i in range(50)])
+    store.persist()
+
+    reopened = store_class(path=str(tmp_path))
+    where = {"$and": [{"brand": "b"}, {"scraped_time": {"$gte": 1700000020}}]}
+    result = reopened.query([embeddings[7].tolist()], n=5, where=where)
+    assert len(result["ids"][0]) == 5
+    assert all(matches_where(metadatas[int(item_id)], where) for item_id in result["ids"][0])